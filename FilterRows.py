@@ -1,142 +1,121 @@
+import argparse
 import pandas as pd
 import psycopg2
 from datetime import datetime
 
+from bulk_upsert import copy_rows
+
 # Database connection string
 DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
 
-# Function to select table and score type (hardcoded for debugging)
-def select_table_and_score():
-    selected_table = 'top_1_scores'
-    selected_score = 'n1'  # Hardcode to 'n1' to match your example
-    return selected_table, selected_score
+SCORE_TABLES = [f"{side}_{depth}_scores" for side in ('top', 'bottom') for depth in (1, 2, 3)]
+SCORE_TYPES = ['n1', 'n2', 'n3', 'b1', 'b2', 'b3']
+ROWS_TABLE = '_filter_rows'
 
-# Function to get indices for a stock symbol
-def get_stock_indices(conn, stock_symbol):
-    query = """
-    SELECT index_id 
-    FROM stock_index_mapping 
-    WHERE stock_symbol = %s
-    """
-    try:
-        with conn.cursor() as cur:
-            cur.execute(query, (stock_symbol,))
-            results = cur.fetchall()
-            indices = [row[0] for row in results]
-            print(f"Indices for stock_symbol '{stock_symbol}': {indices}")
-            return indices
-    except Exception as e:
-        print(f"Error fetching indices for {stock_symbol}: {e}")
-        return []
+# Function to select table and score type
+def select_table_and_score(table_name='top_1_scores', score_type='n1'):
+    if table_name not in SCORE_TABLES:
+        raise ValueError(f"Table must be one of {SCORE_TABLES}")
+    if score_type not in SCORE_TYPES:
+        raise ValueError(f"Score type must be one of {SCORE_TYPES}")
+    return table_name, score_type
 
-# Function to check if any index exists in selected table for given month and year
-# Also fetch the matching rows for debugging
-def check_index_in_table(conn, table_name, score_type, indices, year, month):
-    # First, check if a matching row exists
-    exists_query = f"""
-    SELECT EXISTS (
-        SELECT 1 
-        FROM {table_name} 
-        WHERE sectoral_index_id = ANY(%s)
-        AND EXTRACT(YEAR FROM trade_date) = %s
-        AND EXTRACT(MONTH FROM trade_date) = %s
-        AND score_type = %s
-    )
+# Function to test every (date, symbol) row at once
+def match_mask(conn, dates, symbols, table_name, score_type, verbose=False):
     """
-    # Then, fetch the matching rows for debugging
-    debug_query = f"""
-    SELECT trade_date, ratio_type, sectoral_index_id, score_type, score_value
-    FROM {table_name}
-    WHERE sectoral_index_id = ANY(%s)
-    AND EXTRACT(YEAR FROM trade_date) = %s
-    AND EXTRACT(MONTH FROM trade_date) = %s
-    AND score_type = %s
+    Boolean mask over the rows: True where any index the symbol maps to has a `score_type`
+    row in `table_name` in the date's month. The rows are COPYed into a temp table and tested
+    with one semi-join; rows with a missing date or symbol are False.
     """
-    try:
-        with conn.cursor() as cur:
-            # Check existence
-            cur.execute(exists_query, (indices, year, month, score_type))
-            result = cur.fetchone()[0]
-            print(f"Checking {table_name} for indices {indices}, year {year}, month {month}, score_type '{score_type}': EXISTS = {result}")
-            
-            # Fetch matching rows for debugging
-            if result:
-                cur.execute(debug_query, (indices, year, month, score_type))
-                matching_rows = cur.fetchall()
-                print(f"Matching rows in {table_name}:")
-                for row in matching_rows:
-                    print(f"  {row}")
-            else:
-                print(f"No matching rows found in {table_name}")
-            
-            return result
-    except Exception as e:
-        print(f"Error checking table {table_name}: {e}")
-        return False
+    months = dates.dt.to_period('M').dt.start_time.dt.date
+    valid = dates.notna() & symbols.notna()
+    rows = zip(range(len(dates)), symbols.astype(str), months)
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TEMP TABLE {ROWS_TABLE} (ord INT, stock_symbol TEXT, month_start DATE)
+            ON COMMIT DROP
+        """)
+        copy_rows(cur, ROWS_TABLE, ['ord', 'stock_symbol', 'month_start'],
+                  (row for row, keep in zip(rows, valid) if keep))
+        cur.execute(f"""
+            SELECT f.ord
+            FROM {ROWS_TABLE} f
+            WHERE EXISTS (
+                SELECT 1
+                FROM stock_index_mapping sim
+                JOIN {table_name} t ON t.sectoral_index_id = sim.index_id
+                WHERE sim.stock_symbol = f.stock_symbol
+                AND t.score_type = %s
+                AND t.trade_date >= f.month_start
+                AND t.trade_date < f.month_start + INTERVAL '1 month'
+            )
+        """, (score_type,))
+        matched = [row[0] for row in cur.fetchall()]
+
+        if verbose:
+            cur.execute(f"""
+                SELECT f.ord, f.stock_symbol, t.trade_date, t.ratio_type, t.sectoral_index_id,
+                       t.score_type, t.score_value
+                FROM {ROWS_TABLE} f
+                JOIN stock_index_mapping sim ON sim.stock_symbol = f.stock_symbol
+                JOIN {table_name} t ON t.sectoral_index_id = sim.index_id
+                WHERE t.score_type = %s
+                AND t.trade_date >= f.month_start
+                AND t.trade_date < f.month_start + INTERVAL '1 month'
+                ORDER BY f.ord, t.trade_date, t.sectoral_index_id
+            """, (score_type,))
+            print(f"Matching rows in {table_name}:")
+            for row in cur.fetchall():
+                print(f"  {row}")
+
+    mask = pd.Series(False, index=dates.index)
+    mask.iloc[matched] = True
+    return mask
 
 # Main processing function
-def process_excel_file(file_path):
+def process_excel_file(file_path, table_name='top_1_scores', score_type='n1', verbose=False):
     # Establish database connection
     conn = psycopg2.connect(DEFAULT_DB_URL)
-    
+
     # Select table and score type
-    selected_table, selected_score = select_table_and_score()
+    selected_table, selected_score = select_table_and_score(table_name, score_type)
     print(f"Selected table: {selected_table}, Score type: {selected_score}")
-    
+
     # Read Excel file with date parsing
     df = pd.read_excel(file_path)
-    
+
     # Convert first column to datetime with specific format
     df.iloc[:, 0] = pd.to_datetime(df.iloc[:, 0], format='%d-%m-%Y')
-    
-    # Lists to keep track of rows to keep
-    rows_to_keep = []
-    
-    # Process each row
-    for index, row in df.iterrows():
-        # Extract month and year from date
-        date = row[0]
-        year = date.year
-        month = date.month
-        stock_symbol = row[1]
-        print(f"\nProcessing row: date={date}, symbol={stock_symbol}")
-        
-        # Get all indices for this stock
-        indices = get_stock_indices(conn, stock_symbol)
-        
-        if not indices:
-            print(f"No indices found for {stock_symbol}, skipping row")
-            continue  # Skip if no indices found
-            
-        # Check if any index exists in selected table
-        exists = check_index_in_table(conn, selected_table, selected_score, 
-                                    indices, year, month)
-        
-        if exists:
-            print(f"Keeping row for {stock_symbol} (found matching entry in {selected_table})")
-            rows_to_keep.append(index)
-        else:
-            print(f"Deleting row for {stock_symbol} (no matching entry in {selected_table})")
-    
-    # Filter dataframe to keep only valid rows
-    filtered_df = df.loc[rows_to_keep]
-    
-    # Close connection
-    conn.close()
-    
+
+    try:
+        # Keep the rows with a matching entry in the selected table
+        mask = match_mask(conn, pd.to_datetime(df.iloc[:, 0]), df.iloc[:, 1],
+                          selected_table, selected_score, verbose)
+        filtered_df = df[mask.values]
+        print(f"Keeping {int(mask.sum())} of {len(df)} rows (matching entry in {selected_table})")
+    finally:
+        # Close connection
+        conn.close()
+
     return filtered_df
 
 # Example usage
 if __name__ == "__main__":
-    file_path = "addColumns.xlsx"  # Replace with your file path
+    parser = argparse.ArgumentParser(description="Keep the rows whose stock has a score in a top/bottom table that month.")
+    parser.add_argument('file_path', nargs='?', default="addColumns.xlsx")
+    parser.add_argument('--table', choices=SCORE_TABLES, default='top_1_scores')
+    parser.add_argument('--score', choices=SCORE_TYPES, default='n1')
+    parser.add_argument('--verbose', action='store_true', help="print the matching score rows")
+    args = parser.parse_args()
+    file_path = args.file_path
     try:
-        result_df = process_excel_file(file_path)
+        result_df = process_excel_file(file_path, args.table, args.score, args.verbose)
         print(f"\nOriginal rows: {len(pd.read_excel(file_path))}")
         print(f"Filtered rows: {len(result_df)}")
         print("\nFiltered DataFrame:")
         print(result_df)
-        
+
         # Optionally save the filtered result
         result_df.to_excel("filtered_output.xlsx", index=False)
     except Exception as e:
-        print(f"Error processing file: {e}")
\ No newline at end of file
+        print(f"Error processing file: {e}")
@@ -2,6 +2,8 @@ import psycopg2
 from datetime import date
 from typing import List, Dict, Tuple
 
+from data_generation import bump_generation, create_generation_table
+
 # Database connection string (adjust as needed)
 DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
 
@@ -167,6 +169,7 @@ def populate_top_scores_tables():
                                     SET score_value = EXCLUDED.score_value
                                 """, (trade_date, ratio_type, sectoral_id, score_type, score))
 
+                bump_generation(cur, 'top_1_scores', 'top_2_scores', 'top_3_scores')
                 conn.commit()
                 print("Top scores tables populated successfully!")
     except psycopg2.Error as e:
@@ -174,6 +177,7 @@ def populate_top_scores_tables():
 
 def main():
     create_top_scores_tables()
+    create_generation_table()
     populate_top_scores_tables()
 
 if __name__ == "__main__":
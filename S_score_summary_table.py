@@ -2,6 +2,8 @@ import psycopg2
 import pandas as pd
 from datetime import datetime
 
+import columnar_export
+
 # Default database URL
 DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
 
@@ -17,12 +19,15 @@ def parse_db_url(db_url):
 # Database connection parameters
 db_params = parse_db_url(DEFAULT_DB_URL)
 
-# Function to connect to database and generate CSV
-def generate_ratio_csv(ratio_choice='n1'):
+# Function to connect to database and generate CSV (or parquet / arrow)
+def generate_ratio_csv(ratio_choice='n1', output_format='csv'):
     # Validate ratio choice
     valid_ratios = ['n1', 'n2', 'n3', 'b1', 'b2', 'b3']
     if ratio_choice not in valid_ratios:
         raise ValueError(f"Invalid ratio choice. Must be one of {valid_ratios}")
+    output_formats = ['csv'] + list(columnar_export.COLUMNAR_FORMATS)
+    if output_format not in output_formats:
+        raise ValueError(f"Invalid output format. Must be one of {output_formats}")
 
     # Determine which table to use based on ratio choice
     table_name = 'n_ratios' if ratio_choice.startswith('n') else 'b_ratios'
@@ -78,6 +83,17 @@ def generate_ratio_csv(ratio_choice='n1'):
                 values.append(value)
             df_data[index_name] = values
 
+        if output_format in columnar_export.COLUMNAR_FORMATS:
+            # Build the typed columns directly; a DataFrame would hold the nullable scores as floats
+            columnar_export.require_pyarrow()
+            types = {name: columnar_export.pa.int32() for name in df_data}
+            types['trade_date'] = columnar_export.pa.string()
+            table = columnar_export.table_from_columns(df_data, types)
+            output_file = f'monthly_{ratio_choice}_data.{columnar_export.EXTENSIONS[output_format]}'
+            columnar_export.write_table(table, output_file, output_format)
+            print(f"{output_format.capitalize()} file '{output_file}' has been generated successfully.")
+            return
+
         # Create DataFrame
         df = pd.DataFrame(df_data)
 
@@ -98,4 +114,5 @@ def generate_ratio_csv(ratio_choice='n1'):
 if __name__ == "__main__":
     # Choose which ratio to generate (n1, n2, n3, b1, b2, or b3)
     chosen_ratio = 'n1'  # Change this to generate for different ratio
-    generate_ratio_csv(chosen_ratio)
\ No newline at end of file
+    chosen_format = 'csv'  # or 'parquet' / 'arrow'
+    generate_ratio_csv(chosen_ratio, chosen_format)
\ No newline at end of file
@@ -7,6 +7,8 @@ import io
 import sys
 from werkzeug.exceptions import BadRequest, InternalServerError
 
+from date_filters import month_predicate
+
 app = Flask(__name__)
 
 # Database connection configuration
@@ -76,16 +78,17 @@ def get_topbottom_scores():
         cursor.execute("SELECT index_id, index_name FROM indices")
         index_map = {row[0]: row[1] for row in cursor.fetchall()}
 
+        month_filter, month_params = month_predicate(year, month)
+
         # Helper function to fetch scores and sectors with subtype filtering
         def fetch_scores(table_num, rank=None):
             table_name = f"{table_prefix}_{table_num}_scores"
             query = f"""
                 SELECT sectoral_index_id, score_value
                 FROM {table_name}
-                WHERE EXTRACT(MONTH FROM trade_date) = %s
-                AND EXTRACT(YEAR FROM trade_date) = %s
+                WHERE {month_filter}
             """
-            params = [month, year]
+            params = list(month_params)
             if subtype:  # Filter by score_type if subtype is provided
                 query += " AND score_type = %s"
                 params.append(subtype)
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+import asyncpg
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import BadRequest
+from werkzeug.http import parse_accept_header, parse_etags
+
+from app_final import (
+    DEFAULT_DB_URL, DATA_GENERATION_INTERVAL, SCORE_CUBE, TOPBOTTOM_TABLES, all_scores_query,
+    app as flask_app, compressor, parse_topbottom_args, response_cache, score_cubes,
+    start_cache_listener, subtype_scores, topbottom_result, topbottom_table_query,
+)
+from date_filters import date_range_predicate, month_predicate
+
+# ASGI entry point: `uvicorn app_async:app`. The busiest JSON routes are served natively on an
+# asyncpg pool, running a handler's independent queries concurrently; every other route and
+# format (file downloads, CSV streams, the batch endpoint) goes to the Flask app from
+# app_final.py, run on a thread pool. Native routes share the Flask routes' ETags and
+# response_cache entries, so a client sees the same responses whichever mode serves it.
+ASYNC_DB_POOL_MIN = int(os.environ.get('ASYNC_DB_POOL_MIN', 2))
+ASYNC_DB_POOL_MAX = int(os.environ.get('ASYNC_DB_POOL_MAX', 20))
+
+flask_asgi = WSGIMiddleware(flask_app)
+
+def asyncpg_connect_kwargs(dsn):
+    """asyncpg.connect() keyword arguments for a libpq key=value string such as DEFAULT_DB_URL."""
+    names = {'dbname': 'database', 'host': 'host', 'port': 'port', 'user': 'user', 'password': 'password'}
+    kwargs = {}
+    for part in dsn.split():
+        key, value = part.split('=', 1)
+        value = value.strip("'")
+        if key in names and value:
+            kwargs[names[key]] = int(value) if key == 'port' else value
+    return kwargs
+
+def asyncpg_query(query, params):
+    """
+    `query` with psycopg2's %s placeholders numbered $1, $2, ... for asyncpg. Date parameters
+    are cast to date so PostgreSQL compares them to timestamptz columns in the session time
+    zone, as it does for the date literals psycopg2 sends.
+    """
+    params = list(params)
+    positions = iter(range(1, len(params) + 1))
+
+    def placeholder(match):
+        n = next(positions)
+        return f"${n}::date" if type(params[n - 1]) is date else f"${n}"
+
+    return re.sub(r'%s', placeholder, query), params
+
+async def fetch(pool, query, params=()):
+    query, params = asyncpg_query(query, params)
+    return await pool.fetch(query, *params)
+
+class AsyncGenerationReader:
+    """The current data generations, read through the pool at most once every `interval` seconds."""
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._generations = ()
+        self._read_at = float('-inf')
+        self._reading = False
+
+    async def current(self, pool):
+        if not self._reading and time.monotonic() - self._read_at >= self.interval:
+            self._reading = True
+            try:
+                rows = await pool.fetch("SELECT table_name, generation FROM data_generation ORDER BY table_name")
+                self._generations = tuple(tuple(row) for row in rows)
+            except asyncpg.PostgresError as e:
+                print(f"Error reading data_generation: {e}")
+            finally:
+                self._read_at = time.monotonic()
+                self._reading = False
+        return self._generations
+
+data_generations = AsyncGenerationReader(DATA_GENERATION_INTERVAL)
+
+class NativeRoute:
+    """
+    ASGI app answering a GET with `handler(request, pool, generations)`, which returns a
+    (payload, status) pair, or None to hand the request to the Flask app. Applies the same ETag,
+    response_cache and compression handling as app_final's conditional_get, cached_response
+    and finish_response; `cached` and `lowercase_args` match the Flask view's cached_response.
+    With `json_errors` the handler's errors are answered as the Flask view's try/except does;
+    without, the request is handed to the Flask view, so it fails the same way there.
+    """
+    def __init__(self, handler, cached=False, lowercase_args=(), json_errors=False):
+        self.handler = handler
+        self.cached = cached
+        self.lowercase_args = lowercase_args
+        self.json_errors = json_errors
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        pool = request.app.state.pool
+        encoding = compressor.negotiate(parse_accept_header(request.headers.get('accept-encoding')))
+        generations = await data_generations.current(pool)
+        params = tuple(sorted(request.query_params.multi_items()))
+
+        etag = None
+        if generations:
+            etag = hashlib.md5(repr((request.url.path, params, generations, encoding)).encode()).hexdigest()
+            if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+                headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+                await Response(status_code=304, headers=headers)(scope, receive, send)
+                return
+
+        key = None
+        if self.cached:
+            start_cache_listener()
+            key_params = tuple(sorted(
+                ((name, value.lower() if name in self.lowercase_args else value) for name, value in params),
+                key=lambda item: item[0]
+            ))
+            key = (request.url.path, key_params, generations, encoding)
+            hit, cached = response_cache.get(key)
+            if hit:
+                body, status, headers = cached
+                await Response(body, status_code=status, headers=dict(headers))(scope, receive, send)
+                return
+
+        try:
+            result = await self.handler(request, pool, generations)
+        except BadRequest as e:
+            result = ({"error": str(e)}, 400) if self.json_errors else None
+        except Exception as e:
+            result = ({"error": f"An unexpected error occurred: {str(e)}"}, 500) if self.json_errors else None
+        if result is None:
+            await flask_asgi(scope, receive, send)
+            return
+
+        payload, status = result
+        # jsonify's serialization, so both modes send the same bytes under the same ETag
+        body = flask_app.json.response(payload).get_data()
+        headers = {'Content-Type': 'application/json'}
+        if status == 200:
+            headers['Vary'] = 'Accept-Encoding'
+            if etag:
+                headers['ETag'] = f'"{etag}"'
+                headers['Cache-Control'] = 'no-cache'
+            if encoding is not None and len(body) >= compressor.min_size:
+                body = compressor.compress_body(body, encoding)
+                headers['Content-Encoding'] = encoding
+            if key is not None:
+                response_cache.set(key, (body, status, list(headers.items())))
+        await Response(body, status_code=status, headers=headers)(scope, receive, send)
+
+async def get_all_scores(request, pool, generations):
+    args = request.query_params
+    stock = args.get('stock')
+    aggregation_method = args.get('aggregation_method', 'max')
+    day = datetime.strptime(args.get('date', ''), '%Y-%m-%d')
+    month_filter, month_params = month_predicate(day.year, day.month, 'r.trade_date')
+
+    cube = score_cubes.get(generations) if SCORE_CUBE else None
+    if cube is not None:
+        extremes = cube.stock_month_extremes(stock, day.year, day.month)
+        results = [extremes] if extremes is not None else []
+    else:
+        rows = await fetch(pool, all_scores_query(month_filter, generations), [stock, *month_params])
+        results = [tuple(row)[1:] for row in rows]
+
+    if not results:
+        return {"error": "No scores found"}, 404
+    return {"date": day.strftime('%Y-%m'), "scores": subtype_scores(results[0], aggregation_method)}, 200
+
+async def get_all_scores_range(request, pool, generations):
+    args = request.query_params
+    stock = args.get('stock')
+    aggregation_method = args.get('aggregation_method', 'max')
+    start_date = datetime.strptime(args.get('start_date', '2018-04-01'), '%Y-%m-%d')
+    end_date = datetime.strptime(args.get('end_date', ''), '%Y-%m-%d')
+    date_filter, date_params = date_range_predicate(start_date, end_date, 'r.trade_date')
+
+    rows = await fetch(pool, all_scores_query(date_filter, generations), [stock, *date_params])
+    if not rows:
+        return {"error": "No scores found"}, 404
+    scores = [{"date": row[0], "scores": subtype_scores(tuple(row)[1:], aggregation_method)} for row in rows]
+    return {"scores": scores}, 200
+
+async def get_topbottom_scores(request, pool, generations):
+    month, year, direction, direction_n, subtype, file_format = parse_topbottom_args(request.query_params)
+    if file_format != 'json':
+        return None
+
+    # The indices lookup and each table's scores run at once, on their own pooled connections
+    month_filter, month_params = month_predicate(year, month)
+    index_rows, *rows_by_table = await asyncio.gather(
+        fetch(pool, "SELECT index_id, index_name FROM indices"),
+        *(fetch(pool, *topbottom_table_query(direction, table_num, rank, month_filter, month_params, subtype))
+          for table_num, rank in TOPBOTTOM_TABLES[:direction_n])
+    )
+    index_map = {row[0]: row[1] for row in index_rows}
+    rows = [row for table_rows in rows_by_table for row in table_rows]
+    result, _ = topbottom_result(month, year, direction, subtype, direction_n, index_map, rows)
+    return result, 200
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.pool = await asyncpg.create_pool(
+        min_size=ASYNC_DB_POOL_MIN, max_size=ASYNC_DB_POOL_MAX, **asyncpg_connect_kwargs(DEFAULT_DB_URL)
+    )
+    try:
+        yield
+    finally:
+        await app.state.pool.close()
+
+app = Starlette(
+    routes=[
+        Route('/api/get_all_scores', NativeRoute(get_all_scores, cached=True), methods=['GET']),
+        Route('/api/get_all_scores_range', NativeRoute(get_all_scores_range), methods=['GET']),
+        Route('/api/topbottom_scores',
+              NativeRoute(get_topbottom_scores, cached=True, lowercase_args=('direction', 'subtype', 'file_format'),
+                          json_errors=True),
+              methods=['GET']),
+        Mount('/', app=flask_asgi),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    port = int(os.environ.get('FLASK_PORT', 8080))
+    uvicorn.run(app, host='0.0.0.0', port=port)
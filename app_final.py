@@ -1,32 +1,241 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, g, stream_with_context
 import psycopg2
 import pandas as pd
 from datetime import datetime
-import calendar
 import os
 import io
 import sys
 import json
+import hashlib
+import time
+from contextlib import ExitStack
+from functools import wraps
+from itertools import groupby
+from threading import Lock
 from werkzeug.exceptions import BadRequest, InternalServerError
 
+import columnar_export
+from csv_stream import csv_chunks, iter_query
+from data_generation import GenerationReader
+from date_filters import date_range_predicate, month_predicate
+from db_pool import ConnectionPool
+from response_cache import ResponseCache, listen_for_invalidation
+from response_encoding import ResponseCompressor
+from score_cube import SUBTYPES, ScoreCubeStore
+
 app = Flask(__name__)
 
 # Database connection configuration
 DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 256))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+DATA_GENERATION_INTERVAL = float(os.environ.get('DATA_GENERATION_INTERVAL', 5))
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 50000))
+SCORE_CUBE = os.environ.get('SCORE_CUBE', 'false').lower() in ('true', '1', 'yes')
+INDEX_MAP_TTL = float(os.environ.get('INDEX_MAP_TTL', 300))
+
+FILE_FORMATS = ['excel', 'csv', 'parquet', 'arrow']
+
+# Endpoints reporting live process state; never answered with 304
+LIVE_ENDPOINTS = {'get_db_pool_metrics', 'get_cache_stats'}
+
+# Shared by every request in this process
+db_pool = ConnectionPool(DEFAULT_DB_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT)
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+data_generations = GenerationReader(db_pool.connection, DATA_GENERATION_INTERVAL)
+compressor = ResponseCompressor(COMPRESSION_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY)
+score_cubes = ScoreCubeStore(db_pool.connection)
+_cache_listener = None
+# (data generations, monotonic read time, {index_id: index_name}) of the last indices read
+_index_map = ((), float('-inf'), {})
+_cache_listener_lock = Lock()
 
 def get_db_connection():
-    try:
-        connection = psycopg2.connect(DEFAULT_DB_URL)
-        return connection
-    except Exception as e:
-        raise InternalServerError(f"Database connection failed: {str(e)}")
+    """The request's pooled connection, checked out on first use and returned when the request ends."""
+    if 'db_checkout' not in g:
+        checkout = ExitStack()
+        try:
+            g.db_conn = checkout.enter_context(db_pool.connection())
+        except Exception as e:
+            raise InternalServerError(f"Database connection failed: {str(e)}")
+        g.db_checkout = checkout
+    return g.db_conn
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    # Runs after every request, including early returns and errors
+    checkout = g.pop('db_checkout', None)
+    g.pop('db_conn', None)
+    if checkout is not None:
+        checkout.close()
+
+def start_cache_listener():
+    """Start clearing response_cache on the jobs' NOTIFY, once per process and only when first needed."""
+    global _cache_listener
+    with _cache_listener_lock:
+        if _cache_listener is None:
+            _cache_listener = listen_for_invalidation(response_cache, DEFAULT_DB_URL)
+
+def current_score_cube():
+    """The in-memory score cube, when SCORE_CUBE is on and it holds this request's data generations."""
+    if not SCORE_CUBE:
+        return None
+    return score_cubes.get(g.get('data_generations', ()))
+
+def table_built(table_name, generations=None):
+    """
+    Whether a table the scorers maintain (index_monthly_scores, stock_monthly_scores) has been
+    built; they refresh it whenever they write ratios, bumping its data generation. Checks the
+    request's data generations unless others are given.
+    """
+    if generations is None:
+        generations = g.get('data_generations', ())
+    return any(name == table_name for name, _ in generations)
+
+def stock_monthly_scores_built():
+    return table_built('stock_monthly_scores')
+
+def all_scores_query(date_filter, generations=None):
+    """
+    Max and min of every n1..b3 per month across a stock's indices, grouped in SQL. Reads
+    index_monthly_scores (one row per index and month) once built, plus the ratio rows it does
+    not hold yet, such as a back-filled index's months written before its refresh; the ratio
+    tables alone before.
+    """
+    materialized, unmaterialized = "", ""
+    if table_built('index_monthly_scores', generations):
+        materialized = f"""SELECT trade_date, sectoral_index_id, {", ".join(SUBTYPES)}
+            FROM index_monthly_scores
+            UNION ALL"""
+        unmaterialized = """
+            WHERE NOT EXISTS (
+                SELECT 1 FROM index_monthly_scores s
+                WHERE s.sectoral_index_id = r.sectoral_index_id
+                AND s.month = date_trunc('month', r.trade_date)::date
+                AND s.{prefix}_rated
+            )"""
+    source = f"""(
+            {materialized}
+            SELECT trade_date, sectoral_index_id, n1, n2, n3, NULL::int AS b1, NULL::int AS b2, NULL::int AS b3
+            FROM n_ratios r{unmaterialized.format(prefix='n')}
+            UNION ALL
+            SELECT trade_date, sectoral_index_id, NULL, NULL, NULL, b1, b2, b3
+            FROM b_ratios r{unmaterialized.format(prefix='b')}
+        )"""
+    aggregates = ", ".join(f"MAX(r.{subtype}), MIN(r.{subtype})" for subtype in SUBTYPES)
+    return f"""
+        SELECT to_char(date_trunc('month', r.trade_date), 'YYYY-MM') AS month, {aggregates}
+        FROM {source} r
+        JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
+        WHERE sim.stock_symbol = %s
+        AND {date_filter}
+        GROUP BY 1
+        ORDER BY 1
+    """
 
-# Helper function to get month start and end dates
-def get_month_bounds(date):
-    year, month = date.year, date.month
-    first_day = datetime(year, month, 1)
-    last_day = datetime(year, month, calendar.monthrange(year, month)[1])
-    return first_day, last_day
+def subtype_scores(extremes, aggregation_method):
+    """{subtype: score} from (max, min) pairs flattened in SUBTYPES order; unscored subtypes are left out."""
+    scores = {}
+    for i, subtype in enumerate(SUBTYPES):
+        max_score, min_score = extremes[2 * i], extremes[2 * i + 1]
+        if max_score is None:
+            continue
+        if aggregation_method == 'max':
+            scores[subtype] = max_score
+        elif aggregation_method == 'min':
+            scores[subtype] = min_score
+        else:  # both
+            scores[subtype] = {'max': max_score, 'min': min_score}
+    return scores
+
+def ratio_table(subtype):
+    return 'n_ratios' if subtype.startswith('n') else 'b_ratios'
+
+def index_names(cursor):
+    """
+    {index_id: index_name} from the indices table, shared by every request in the process. It is
+    re-read through `cursor` when the request's data generations move or after INDEX_MAP_TTL
+    seconds.
+    """
+    global _index_map
+    generations, read_at, names = _index_map
+    current = g.get('data_generations', ())
+    if generations != current or time.monotonic() - read_at >= INDEX_MAP_TTL:
+        cursor.execute("SELECT index_id, index_name FROM indices")
+        names = {row[0]: row[1] for row in cursor.fetchall()}
+        _index_map = (current, time.monotonic(), names)
+    return names
+
+@app.before_request
+def conditional_get():
+    """
+    Negotiate the response encoding and give each GET of score data an ETag from its path, query
+    parameters, encoding and the current data generations. A matching If-None-Match is answered
+    with 304 before any query runs.
+    """
+    g.content_encoding = compressor.negotiate(request.accept_encodings)
+    if request.method != 'GET' or request.endpoint in LIVE_ENDPOINTS:
+        return None
+    g.data_generations = data_generations.current()
+    if not g.data_generations:
+        return None
+    params = tuple(sorted(request.args.items(multi=True)))
+    tag = (request.path, params, g.data_generations, g.content_encoding)
+    g.etag = hashlib.md5(repr(tag).encode()).hexdigest()
+    if request.if_none_match.contains_weak(g.etag):
+        response = Response(status=304)
+        response.set_etag(g.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+    return None
+
+@app.after_request
+def finish_response(response):
+    """Stamp the request's ETag on a successful response and compress it. Safe to apply twice."""
+    etag = g.get('etag')
+    if etag and response.status_code == 200 and response.get_etag()[0] is None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return compressor.compress(response, g.get('content_encoding'))
+
+def cached_response(*lowercase_args):
+    """
+    Serve successful responses of a read-only endpoint from response_cache, keyed on the path,
+    its query parameters sorted by name, the data generations and the negotiated encoding. Values
+    of lowercase_args are lower-cased first, as the view does. Entries are stored already
+    compressed and ETag-stamped, so a hit is sent as is.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            start_cache_listener()
+            params = tuple(sorted(
+                ((name, value.lower() if name in lowercase_args else value)
+                 for name, value in request.args.items(multi=True)),
+                key=lambda item: item[0]
+            ))
+            key = (request.path, params, g.get('data_generations', ()), g.get('content_encoding'))
+            hit, cached = response_cache.get(key)
+            if hit:
+                body, status, headers = cached
+                return Response(body, status=status, headers=headers)
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response = finish_response(response)
+                # send_file responses stream from their buffer; read it so the body can be kept
+                response.direct_passthrough = False
+                headers = [(name, value) for name, value in response.headers if name != 'Date']
+                response_cache.set(key, (response.get_data(), response.status_code, headers))
+            return response
+        return wrapper
+    return decorator
 
 # Helper function to validate month and year
 def validate_month_year(month, year):
@@ -63,11 +272,36 @@ def generate_file_output(df, file_format, filename_prefix):
             as_attachment=True,
             download_name=f"{filename_prefix}.csv"
         )
+    elif file_format in columnar_export.COLUMNAR_FORMATS:
+        try:
+            columnar_export.write_table(columnar_export.dataframe_to_table(df), output, file_format)
+        except RuntimeError as e:
+            raise InternalServerError(str(e))
+        output.seek(0)
+        return send_file(
+            output,
+            mimetype=columnar_export.MIMETYPES[file_format],
+            as_attachment=True,
+            download_name=f"{filename_prefix}.{columnar_export.EXTENSIONS[file_format]}"
+        )
     else:
-        raise BadRequest("Invalid file format. Use 'excel' or 'csv'.")
+        raise BadRequest("Invalid file format. Use 'excel', 'csv', 'parquet' or 'arrow'.")
+
+def stream_requested():
+    return request.args.get('stream', 'false').lower() in ('true', '1', 'yes')
+
+# Helper function to stream a CSV file as its rows are fetched
+def generate_csv_stream(header, rows, filename_prefix):
+    # stream_with_context keeps the request, and its pooled connection, until the last chunk
+    return Response(
+        stream_with_context(csv_chunks(header, rows)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename_prefix}.csv'}
+    )
 
 # 1. get_score_forReferences (single date)
 @app.route('/api/get_score', methods=['GET'])
+@cached_response()
 def get_score():
     stock = request.args.get('stock')
     score_type = request.args.get('score_type')
@@ -77,29 +311,32 @@ def get_score():
     export_format = request.args.get('export_format')
     
     date = datetime.strptime(date_str, '%Y-%m-%d')
-    month_start, month_end = get_month_bounds(date)
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
+    month_filter, month_params = month_predicate(date.year, date.month, 'r.trade_date')
     
     table = 'n_ratios' if score_type in ['s', 'i', 'p'] and score_subtype.startswith('n') else 'b_ratios'
     score_column = score_subtype
     
-    query = f"""
-        SELECT r.trade_date, r.sectoral_index_id, r.{score_column}
-        FROM {table} r
-        JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
-        WHERE sim.stock_symbol = %s
-        AND r.trade_date >= %s AND r.trade_date <= %s
-        AND r.{score_column} IS NOT NULL
-        ORDER BY r.trade_date
-    """
-    
-    cur.execute(query, (stock, month_start, month_end))
-    results = cur.fetchall()
-    
-    cur.close()
-    conn.close()
+    cube = current_score_cube()
+    if cube is not None and score_column in SUBTYPES and table == ratio_table(score_column):
+        results = cube.stock_month_rows(stock, date.year, date.month, [score_column])
+    else:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
+        query = f"""
+            SELECT r.trade_date, r.sectoral_index_id, r.{score_column}
+            FROM {table} r
+            JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
+            WHERE sim.stock_symbol = %s
+            AND {month_filter}
+            AND r.{score_column} IS NOT NULL
+            ORDER BY r.trade_date
+        """
+        
+        cur.execute(query, (stock, *month_params))
+        results = cur.fetchall()
+        
+        cur.close()
     
     if not results:
         return jsonify({"error": "No scores found"}), 404
@@ -128,7 +365,7 @@ def get_score():
     
     result = aggregated_scores[0] if aggregated_scores else {"error": "No scores found"}
     
-    if export_format in ['excel', 'csv']:
+    if export_format in FILE_FORMATS:
         df = pd.DataFrame([result] if isinstance(result, dict) else result)
         return generate_file_output(df, export_format, f"score_{stock}_{date_str}")
     
@@ -147,6 +384,7 @@ def get_score_range():
     
     start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
     end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    date_filter, date_params = date_range_predicate(start_date, end_date, 'r.trade_date')
     
     conn = get_db_connection()
     cur = conn.cursor()
@@ -154,21 +392,56 @@ def get_score_range():
     table = 'n_ratios' if score_type in ['s', 'i', 'p'] and score_subtype.startswith('n') else 'b_ratios'
     score_column = score_subtype
     
+    if stock_monthly_scores_built() and score_column in SUBTYPES and table == ratio_table(score_column):
+        # One indexed range read of the stock's precomputed months
+        cur.execute(f"""
+            SELECT to_char(r.month, 'YYYY-MM'), r.{score_column}_max, r.{score_column}_min, r.{score_column}_index_ids
+            FROM stock_monthly_scores r
+            WHERE r.stock_symbol = %s
+            AND {date_filter}
+            AND r.{score_column}_max IS NOT NULL
+            ORDER BY r.month
+        """, (stock, *date_params))
+        results = cur.fetchall()
+        cur.close()
+        
+        if not results:
+            return jsonify({"error": "No scores found"}), 404
+        
+        aggregated_scores = []
+        for month, max_score, min_score, index_ids in results:
+            if aggregation_method == 'max':
+                aggregated_score = max_score
+            elif aggregation_method == 'min':
+                aggregated_score = min_score
+            else:  # both
+                aggregated_score = max_score if len(index_ids) == 1 else {'max': max_score, 'min': min_score}
+            aggregated_scores.append({
+                "date": month,
+                "score": aggregated_score,
+                "indices": index_ids if aggregation_method == 'both' and len(index_ids) > 1 else None
+            })
+        
+        if export_format in FILE_FORMATS:
+            df = pd.DataFrame(aggregated_scores)
+            return generate_file_output(df, export_format, f"score_range_{stock}_{start_date_str}_to_{end_date_str}")
+        
+        return jsonify({"scores": aggregated_scores})
+    
     query = f"""
         SELECT r.trade_date, r.sectoral_index_id, r.{score_column}
         FROM {table} r
         JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
         WHERE sim.stock_symbol = %s
-        AND r.trade_date >= %s AND r.trade_date <= %s
+        AND {date_filter}
         AND r.{score_column} IS NOT NULL
         ORDER BY r.trade_date
     """
     
-    cur.execute(query, (stock, start_date, end_date))
+    cur.execute(query, (stock, *date_params))
     results = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     if not results:
         return jsonify({"error": "No scores found"}), 404
@@ -195,7 +468,7 @@ def get_score_range():
             "indices": list(index_scores.keys()) if aggregation_method == 'both' and len(scores) > 1 else None
         })
     
-    if export_format in ['excel', 'csv']:
+    if export_format in FILE_FORMATS:
         df = pd.DataFrame(aggregated_scores)
         return generate_file_output(df, export_format, f"score_range_{stock}_{start_date_str}_to_{end_date_str}")
     
@@ -203,77 +476,32 @@ def get_score_range():
 
 # 2. get_all_scores_forReferences (single date)
 @app.route('/api/get_all_scores', methods=['GET'])
+@cached_response()
 def get_all_scores():
     stock = request.args.get('stock')
     date_str = request.args.get('date')
     aggregation_method = request.args.get('aggregation_method', 'max')
     
     date = datetime.strptime(date_str, '%Y-%m-%d')
-    month_start, month_end = get_month_bounds(date)
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    query = """
-        SELECT 
-            r.trade_date, 
-            r.sectoral_index_id, 
-            r.n1, r.n2, r.n3, 
-            r.b1, r.b2, r.b3
-        FROM (
-            SELECT 
-                trade_date, 
-                sectoral_index_id, 
-                n1, n2, n3, 
-                NULL AS b1, NULL AS b2, NULL AS b3
-            FROM n_ratios
-            UNION ALL
-            SELECT 
-                trade_date, 
-                sectoral_index_id, 
-                NULL AS n1, NULL AS n2, NULL AS n3, 
-                b1, b2, b3
-            FROM b_ratios
-        ) r
-        JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
-        WHERE sim.stock_symbol = %s
-        AND r.trade_date >= %s AND r.trade_date <= %s
-    """
-    
-    cur.execute(query, (stock, month_start, month_end))
-    results = cur.fetchall()
+    month_filter, month_params = month_predicate(date.year, date.month, 'r.trade_date')
     
-    cur.close()
-    conn.close()
+    cube = current_score_cube()
+    if cube is not None:
+        extremes = cube.stock_month_extremes(stock, date.year, date.month)
+        results = [extremes] if extremes is not None else []
+    else:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
+        cur.execute(all_scores_query(month_filter), (stock, *month_params))
+        results = [row[1:] for row in cur.fetchall()]
+        
+        cur.close()
     
     if not results:
         return jsonify({"error": "No scores found"}), 404
     
-    scores_by_subtype = {
-        'n1': {}, 'n2': {}, 'n3': {},
-        'b1': {}, 'b2': {}, 'b3': {}
-    }
-    
-    for trade_date, index_id, n1, n2, n3, b1, b2, b3 in results:
-        month_key = trade_date.strftime('%Y-%m')
-        for subtype, score in [('n1', n1), ('n2', n2), ('n3', n3), 
-                              ('b1', b1), ('b2', b2), ('b3', b3)]:
-            if score is not None:
-                if month_key not in scores_by_subtype[subtype]:
-                    scores_by_subtype[subtype][month_key] = {}
-                scores_by_subtype[subtype][month_key][index_id] = score
-    
-    result = {}
-    for subtype in scores_by_subtype:
-        if scores_by_subtype[subtype]:
-            month = list(scores_by_subtype[subtype].keys())[0]  # Single month
-            scores = list(scores_by_subtype[subtype][month].values())
-            if aggregation_method == 'max':
-                result[subtype] = max(scores)
-            elif aggregation_method == 'min':
-                result[subtype] = min(scores)
-            else:  # both
-                result[subtype] = {'max': max(scores), 'min': min(scores)}
+    result = subtype_scores(results[0], aggregation_method)
     
     return jsonify({"date": date.strftime('%Y-%m'), "scores": result})
 
@@ -287,74 +515,21 @@ def get_all_scores_range():
     
     start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
     end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    date_filter, date_params = date_range_predicate(start_date, end_date, 'r.trade_date')
     
     conn = get_db_connection()
     cur = conn.cursor()
     
-    query = """
-        SELECT 
-            r.trade_date, 
-            r.sectoral_index_id, 
-            r.n1, r.n2, r.n3, 
-            r.b1, r.b2, r.b3
-        FROM (
-            SELECT 
-                trade_date, 
-                sectoral_index_id, 
-                n1, n2, n3, 
-                NULL AS b1, NULL AS b2, NULL AS b3
-            FROM n_ratios
-            UNION ALL
-            SELECT 
-                trade_date, 
-                sectoral_index_id, 
-                NULL AS n1, NULL AS n2, NULL AS n3, 
-                b1, b2, b3
-            FROM b_ratios
-        ) r
-        JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
-        WHERE sim.stock_symbol = %s
-        AND r.trade_date >= %s AND r.trade_date <= %s
-    """
-    
-    cur.execute(query, (stock, start_date, end_date))
+    cur.execute(all_scores_query(date_filter), (stock, *date_params))
     results = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     if not results:
         return jsonify({"error": "No scores found"}), 404
     
-    scores_by_month_subtype = {}
-    for trade_date, index_id, n1, n2, n3, b1, b2, b3 in results:
-        month_key = trade_date.strftime('%Y-%m')
-        if month_key not in scores_by_month_subtype:
-            scores_by_month_subtype[month_key] = {
-                'n1': {}, 'n2': {}, 'n3': {},
-                'b1': {}, 'b2': {}, 'b3': {}
-            }
-        for subtype, score in [('n1', n1), ('n2', n2), ('n3', n3), 
-                              ('b1', b1), ('b2', b2), ('b3', b3)]:
-            if score is not None:
-                scores_by_month_subtype[month_key][subtype][index_id] = score
-    
-    aggregated_scores = []
-    for month in sorted(scores_by_month_subtype.keys()):
-        month_scores = {"date": month, "scores": {}}
-        for subtype in scores_by_month_subtype[month]:
-            if scores_by_month_subtype[month][subtype]:
-                scores = list(scores_by_month_subtype[month][subtype].values())
-                if aggregation_method == 'max':
-                    month_scores["scores"][subtype] = max(scores)
-                elif aggregation_method == 'min':
-                    month_scores["scores"][subtype] = min(scores)
-                else:  # both
-                    month_scores["scores"][subtype] = {
-                        'max': max(scores),
-                        'min': min(scores)
-                    }
-        aggregated_scores.append(month_scores)
+    aggregated_scores = [{"date": month, "scores": subtype_scores(extremes, aggregation_method)}
+                         for month, *extremes in results]
     
     return jsonify({"scores": aggregated_scores})
 
@@ -367,29 +542,32 @@ def get_scores_by_subtype():
     aggregation_method = request.args.get('aggregation_method', 'max')
     
     date = datetime.strptime(date_str, '%Y-%m-%d')
-    month_start, month_end = get_month_bounds(date)
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    table = 'n_ratios' if score_subtype.startswith('n') else 'b_ratios'
-    query = f"""
-        SELECT sim.stock_symbol, r.{score_subtype}
-        FROM {table} r
-        JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
-        WHERE r.trade_date >= %s AND r.trade_date <= %s
-        AND r.{score_subtype} IS NOT NULL
-    """
-    params = [month_start, month_end]
-    if stocks:
-        query += " AND sim.stock_symbol IN %s"
-        params.append(tuple(stocks))
-    
-    cur.execute(query, params)
-    results = cur.fetchall()
+    month_filter, month_params = month_predicate(date.year, date.month, 'r.trade_date')
     
-    cur.close()
-    conn.close()
+    cube = current_score_cube()
+    if cube is not None and score_subtype in SUBTYPES:
+        results = cube.month_stock_scores(date.year, date.month, score_subtype, stocks)
+    else:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
+        table = 'n_ratios' if score_subtype.startswith('n') else 'b_ratios'
+        query = f"""
+            SELECT sim.stock_symbol, r.{score_subtype}
+            FROM {table} r
+            JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
+            WHERE {month_filter}
+            AND r.{score_subtype} IS NOT NULL
+        """
+        params = list(month_params)
+        if stocks:
+            query += " AND sim.stock_symbol IN %s"
+            params.append(tuple(stocks))
+        
+        cur.execute(query, params)
+        results = cur.fetchall()
+        
+        cur.close()
     
     df = pd.DataFrame(results, columns=['stock', 'score'])
     
@@ -418,11 +596,36 @@ def get_scores_by_subtype_range():
     
     start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
     end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    date_filter, date_params = date_range_predicate(start_date, end_date, 'r.trade_date')
     
     conn = get_db_connection()
     cur = conn.cursor()
     
     table = 'n_ratios' if score_subtype.startswith('n') else 'b_ratios'
+    aggregates = {
+        'max': (f"r.{score_subtype}_max", ['score']),
+        'min': (f"r.{score_subtype}_min", ['score']),
+        'both': (f"r.{score_subtype}_max, r.{score_subtype}_min", ['max_score', 'min_score']),
+    }
+    if stock_monthly_scores_built() and score_subtype in SUBTYPES and aggregation_method in aggregates:
+        # Already aggregated per (stock, month); read them in the order groupby gives
+        select_clause, score_columns = aggregates[aggregation_method]
+        query = f"""
+            SELECT r.stock_symbol, to_char(r.month, 'YYYY-MM'), {select_clause}
+            FROM stock_monthly_scores r
+            WHERE {date_filter}
+            AND r.{score_subtype}_max IS NOT NULL
+        """
+        params = list(date_params)
+        if stocks:
+            query += " AND r.stock_symbol IN %s"
+            params.append(tuple(stocks))
+        query += ' ORDER BY r.stock_symbol COLLATE "C", r.month'
+        cur.execute(query, params)
+        aggregated_df = pd.DataFrame(cur.fetchall(), columns=['stock', 'date'] + score_columns)
+        cur.close()
+        return jsonify(aggregated_df.to_dict())
+    
     query = f"""
         SELECT sim.stock_symbol, 
                EXTRACT(YEAR FROM r.trade_date) AS year,
@@ -430,10 +633,10 @@ def get_scores_by_subtype_range():
                r.{score_subtype}
         FROM {table} r
         JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
-        WHERE r.trade_date >= %s AND r.trade_date <= %s
+        WHERE {date_filter}
         AND r.{score_subtype} IS NOT NULL
     """
-    params = [start_date, end_date]
+    params = list(date_params)
     if stocks:
         query += " AND sim.stock_symbol IN %s"
         params.append(tuple(stocks))
@@ -442,7 +645,6 @@ def get_scores_by_subtype_range():
     results = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     df = pd.DataFrame(results, columns=['stock', 'year', 'month', 'score'])
     df['date'] = df['year'].astype(int).astype(str) + '-' + df['month'].astype(int).astype(str).str.zfill(2)
@@ -473,7 +675,7 @@ def get_scores_for_type_date():
         return jsonify({"error": "score_type is required"}), 400
     
     date = datetime.strptime(date_str, '%Y-%m-%d')
-    month_start, month_end = get_month_bounds(date)
+    month_filter, month_params = month_predicate(date.year, date.month, 'r.trade_date')
     
     conn = get_db_connection()
     cur = conn.cursor()
@@ -486,9 +688,9 @@ def get_scores_for_type_date():
         SELECT sim.stock_symbol, {select_clause}
         FROM {table} r
         JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
-        WHERE r.trade_date >= %s AND r.trade_date <= %s
+        WHERE {month_filter}
     """
-    params = [month_start, month_end]
+    params = list(month_params)
     if stocks:
         query += " AND sim.stock_symbol IN %s"
         params.append(tuple(stocks))
@@ -497,7 +699,6 @@ def get_scores_for_type_date():
     results = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     df = pd.DataFrame(results, columns=['stock'] + subtypes)
     
@@ -533,6 +734,7 @@ def get_scores_for_type_range():
     
     start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
     end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    date_filter, date_params = date_range_predicate(start_date, end_date, 'r.trade_date')
     
     conn = get_db_connection()
     cur = conn.cursor()
@@ -541,6 +743,7 @@ def get_scores_for_type_range():
     subtypes = ['n1', 'n2', 'n3'] if table == 'n_ratios' else ['b1', 'b2', 'b3']
     select_clause = ', '.join([f'r.{subtype}' for subtype in subtypes])
     
+    stock_filter = " AND sim.stock_symbol IN %s" if stocks else ""
     query = f"""
         SELECT sim.stock_symbol,
                EXTRACT(YEAR FROM r.trade_date) AS year,
@@ -548,18 +751,78 @@ def get_scores_for_type_range():
                {select_clause}
         FROM {table} r
         JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
-        WHERE r.trade_date >= %s AND r.trade_date <= %s
+        WHERE {date_filter}{stock_filter}
     """
-    params = [start_date, end_date]
+    params = list(date_params)
     if stocks:
-        query += " AND sim.stock_symbol IN %s"
         params.append(tuple(stocks))
     
+    if export_format == 'csv' and stream_requested():
+        # Aggregate in SQL, in the order groupby would give, so rows are written as they arrive
+        cur.close()
+        aggregates = {
+            'max': f"MAX(GREATEST({select_clause})) AS score",
+            'min': f"MIN(LEAST({select_clause})) AS score",
+            'both': f"MAX(GREATEST({select_clause})) AS max_score, MIN(LEAST({select_clause})) AS min_score",
+        }
+        if aggregation_method in aggregates:
+            stream_query = f"""
+                SELECT sim.stock_symbol, to_char(r.trade_date, 'YYYY-MM') AS date,
+                       {aggregates[aggregation_method]}
+                FROM {table} r
+                JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
+                WHERE {date_filter}{stock_filter}
+                GROUP BY 1, 2
+                ORDER BY 1 COLLATE "C", 2
+            """
+            header = ['stock', 'date'] + (['max_score', 'min_score'] if aggregation_method == 'both' else ['score'])
+        else:
+            stream_query = f"""
+                SELECT sim.stock_symbol,
+                       EXTRACT(YEAR FROM r.trade_date)::int AS year,
+                       EXTRACT(MONTH FROM r.trade_date)::int AS month,
+                       {select_clause},
+                       to_char(r.trade_date, 'YYYY-MM') AS date
+                FROM {table} r
+                JOIN stock_index_mapping sim ON r.sectoral_index_id = sim.index_id
+                WHERE {date_filter}{stock_filter}
+            """
+            header = ['stock', 'year', 'month'] + subtypes + ['date']
+        rows = iter_query(conn, stream_query, params)
+        return generate_csv_stream(header, rows, f"scores_{score_type}_{start_date_str}_to_{end_date_str}")
+    
+    if stock_monthly_scores_built() and aggregation_method in ('max', 'min', 'both'):
+        # Each subtype's max/min across the stock's sectors is precomputed per month; a month
+        # counts wherever one of the stock's sectors has a row in the table, scored or not
+        greatest = f"GREATEST({', '.join(f'r.{s}_max' for s in subtypes)})"
+        least = f"LEAST({', '.join(f'r.{s}_min' for s in subtypes)})"
+        select_clause, score_columns = {
+            'max': (greatest, ['score']),
+            'min': (least, ['score']),
+            'both': (f"{greatest}, {least}", ['max_score', 'min_score']),
+        }[aggregation_method]
+        query = f"""
+            SELECT r.stock_symbol, to_char(r.month, 'YYYY-MM'), {select_clause}
+            FROM stock_monthly_scores r
+            WHERE {date_filter}
+            AND r.{table[0]}_rated
+        """
+        if stocks:
+            query += " AND r.stock_symbol IN %s"
+        query += ' ORDER BY r.stock_symbol COLLATE "C", r.month'
+        cur.execute(query, params)
+        result_df = pd.DataFrame(cur.fetchall(), columns=['stock', 'date'] + score_columns)
+        cur.close()
+        
+        if export_format:
+            return generate_file_output(result_df, export_format, f"scores_{score_type}_{start_date_str}_to_{end_date_str}")
+        
+        return jsonify(result_df.to_dict())
+    
     cur.execute(query, params)
     results = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     df = pd.DataFrame(results, columns=['stock', 'year', 'month'] + subtypes)
     df['date'] = df['year'].astype(int).astype(str) + '-' + df['month'].astype(int).astype(str).str.zfill(2)
@@ -597,7 +860,7 @@ def get_score_summary():
         return jsonify({"error": "At least one of score_type or score_subtype must be provided"}), 400
     
     date = datetime.strptime(date_str, '%Y-%m-%d')
-    month_start, month_end = get_month_bounds(date)
+    month_filter, month_params = month_predicate(date.year, date.month, 'r.trade_date')
     
     conn = get_db_connection()
     cur = conn.cursor()
@@ -622,10 +885,10 @@ def get_score_summary():
         COUNT(r.{score_subtype}) as score_count
     """
     where_clause = f"""
-        WHERE r.trade_date >= %s AND r.trade_date <= %s
+        WHERE {month_filter}
         AND r.{score_subtype} IS NOT NULL
     """
-    params = [month_start, month_end]
+    params = list(month_params)
     
     if entity == 'stock':
         query = f"""
@@ -661,7 +924,7 @@ def get_score_summary():
     cur.execute(query, params)
     results = cur.fetchall()
     
-    cur Popeye.close()
+    cur.close()
     
     columns = ['entity_id', 'entity_type', 'avg_score', 'min_score', 'max_score', 'score_count'] if entity is None else ['entity_id', 'avg_score', 'min_score', 'max_score', 'score_count']
     df = pd.DataFrame(results, columns=columns)
@@ -687,6 +950,7 @@ def get_score_summary_range():
     
     start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
     end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    date_filter, date_params = date_range_predicate(start_date, end_date, 'r.trade_date')
     
     conn = get_db_connection()
     cur = conn.cursor()
@@ -713,10 +977,10 @@ def get_score_summary_range():
         COUNT(r.{score_subtype}) as score_count
     """
     where_clause = f"""
-        WHERE r.trade_date >= %s AND r.trade_date <= %s
+        WHERE {date_filter}
         AND r.{score_subtype} IS NOT NULL
     """
-    params = [start_date, end_date]
+    params = list(date_params)
     
     if entity == 'stock':
         query = f"""
@@ -753,7 +1017,6 @@ def get_score_summary_range():
     results = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     columns = ['entity_id', 'entity_type', 'year', 'month', 'avg_score', 'min_score', 'max_score', 'score_count'] if entity is None else ['entity_id', 'year', 'month', 'avg_score', 'min_score', 'max_score', 'score_count']
     df = pd.DataFrame(results, columns=columns)
@@ -783,7 +1046,7 @@ def get_score_summary_by_conditions():
     
     if date_str:
         date = datetime.strptime(date_str, '%Y-%m-%d')
-        month_start, month_end = get_month_bounds(date)
+        month_filter, month_params = month_predicate(date.year, date.month, 'r.trade_date')
     
     conn = get_db_connection()
     cur = conn.cursor()
@@ -833,8 +1096,8 @@ def get_score_summary_by_conditions():
     params = []
     where_clause = build_conditions_clause(conditions, params)
     if date_str:
-        where_clause += " AND r.trade_date >= %s AND r.trade_date <= %s"
-        params.extend([month_start, month_end])
+        where_clause += f" AND {month_filter}"
+        params.extend(month_params)
     if where_clause:
         where_clause = f"WHERE {where_clause} AND r.{score_subtype} IS NOT NULL"
     else:
@@ -875,7 +1138,6 @@ def get_score_summary_by_conditions():
     results = cur.fetchall()
     
     cur.close()
-    conn.close()
     
     columns = ['entity_id', 'entity_type', 'avg_score', 'min_score', 'max_score', 'score_count'] if entity == 'both' else ['entity_id', 'avg_score', 'min_score', 'max_score', 'score_count']
     df = pd.DataFrame(results, columns=columns)
@@ -886,136 +1148,115 @@ def get_score_summary_by_conditions():
     return jsonify(df.to_dict())
 
 # Top/Bottom Scores API
+# (table number, rank filter) of the top/bottom tables; direction_n=k reads the first k
+TOPBOTTOM_TABLES = ((1, None), (2, 2), (3, 3))
+
+def parse_topbottom_args(args):
+    """Validated (month, year, direction, direction_n, subtype, file_format) of a topbottom_scores request."""
+    month, year = validate_month_year(args.get('month'), args.get('year'))
+    direction = (args.get('direction') or '').lower()
+    direction_n = args.get('direction_n')
+    subtype = args.get('subtype', '').lower()
+    file_format = args.get('file_format', 'json').lower()
+
+    if direction not in ['top', 'bottom']:
+        raise BadRequest("Direction must be 'top' or 'bottom'")
+    try:
+        direction_n = int(direction_n)
+        if direction_n not in [1, 2, 3]:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise BadRequest("direction_n must be 1, 2, or 3")
+    valid_subtypes = ['n1', 'n2', 'n3', 'b1', 'b2', 'b3', '']
+    if subtype not in valid_subtypes:
+        raise BadRequest("Subtype must be one of 'n1', 'n2', 'n3', 'b1', 'b2', 'b3', or empty")
+    if file_format not in ['json'] + FILE_FORMATS:
+        raise BadRequest("file_format must be 'json', 'excel', 'csv', 'parquet' or 'arrow'")
+    return month, year, direction, direction_n, subtype, file_format
+
+def topbottom_table_query(table_prefix, table_num, rank, date_filter, date_params, subtype,
+                          columns="sectoral_index_id, score_value"):
+    """SQL and parameters selecting `columns` of one top/bottom table's rows, tagged with the table number."""
+    query = f"""
+        SELECT {table_num} AS table_num, {columns}
+        FROM {table_prefix}_{table_num}_scores
+        WHERE {date_filter}
+    """
+    params = list(date_params)
+    if subtype:
+        query += " AND score_type = %s"
+        params.append(subtype)
+    if rank:
+        query += " AND rank = %s"
+        params.append(rank)
+    return query, params
+
+def topbottom_scores_query(table_prefix, direction_n, date_filter, date_params, subtype,
+                           columns="sectoral_index_id, score_value"):
+    """The first direction_n top/bottom tables' rows in one UNION ALL, each tagged with its table number."""
+    queries, params = [], []
+    for table_num, rank in TOPBOTTOM_TABLES[:direction_n]:
+        query, table_params = topbottom_table_query(table_prefix, table_num, rank, date_filter, date_params,
+                                                    subtype, columns)
+        queries.append(query)
+        params += table_params
+    return "\n        UNION ALL\n".join(queries), params
+
+def topbottom_result(month, year, table_prefix, subtype, direction_n, index_map, rows):
+    """The topbottom_scores JSON result and export rows from (table_num, sectoral_index_id, score_value) rows."""
+    rows_by_table = [[] for _ in range(direction_n)]
+    for table_num, *row in rows:
+        rows_by_table[table_num - 1].append(row)
+
+    result = {'month': month, 'year': year}
+    if subtype:
+        result['subtype'] = subtype
+    df_data = []
+    data_found = False
+    for table_num, rows in enumerate(rows_by_table, start=1):
+        name = f"{table_prefix}_{table_num}"
+        result[f"{name}_scores"] = [row[1] for row in rows]
+        result[f"{name}_sectors"] = [index_map.get(row[0], f"Index_{row[0]}") for row in rows]
+        if rows:
+            data_found = True
+        for index_id, score in rows:
+            df_data.append({
+                'month': month,
+                'year': year,
+                'type': name,
+                'score': score,
+                'sector': index_map.get(index_id, f"Index_{index_id}")
+            })
+
+    if not data_found:
+        message = f"No data found for {table_prefix} scores in {month}/{year}"
+        if subtype:
+            message += f" with subtype '{subtype}'"
+        result['message'] = message
+    return result, df_data
+
 @app.route('/api/topbottom_scores', methods=['GET'])
+@cached_response('direction', 'subtype', 'file_format')
 def get_topbottom_scores():
     try:
-        month = request.args.get('month')
-        year = request.args.get('year')
-        direction = request.args.get('direction').lower()
-        direction_n = request.args.get('direction_n')
-        subtype = request.args.get('subtype', '').lower()
-        file_format = request.args.get('file_format', 'json').lower()
-
-        month, year = validate_month_year(month, year)
-        if direction not in ['top', 'bottom']:
-            raise BadRequest("Direction must be 'top' or 'bottom'")
-        try:
-            direction_n = int(direction_n)
-            if direction_n not in [1, 2, 3]:
-                raise ValueError
-        except ValueError:
-            raise BadRequest("direction_n must be 1, 2, or 3")
-        valid_subtypes = ['n1', 'n2', 'n3', 'b1', 'b2', 'b3', '']
-        if subtype not in valid_subtypes:
-            raise BadRequest("Subtype must be one of 'n1', 'n2', 'n3', 'b1', 'b2', 'b3', or empty")
-        if file_format not in ['json', 'excel', 'csv']:
-            raise BadRequest("file_format must be 'json', 'excel', or 'csv'")
+        month, year, direction, direction_n, subtype, file_format = parse_topbottom_args(request.args)
 
         conn = get_db_connection()
         cursor = conn.cursor()
 
         table_prefix = 'top' if direction == 'top' else 'bottom'
 
-        result = {'month': month, 'year': year}
-        if subtype:
-            result['subtype'] = subtype
-        df_data = []
+        index_map = index_names(cursor)
 
-        cursor.execute("SELECT index_id, index_name FROM indices")
-        index_map = {row[0]: row[1] for row in cursor.fetchall()}
-
-        def fetch_scores(table_num, rank=None):
-            table_name = f"{table_prefix}_{table_num}_scores"
-            query = f"""
-                SELECT sectoral_index_id, score_value
-                FROM {table_name}
-                WHERE EXTRACT(MONTH FROM trade_date) = %s
-                AND EXTRACT(YEAR FROM trade_date) = %s
-            """
-            params = [month, year]
-            if subtype:
-                query += " AND score_type = %s"
-                params.append(subtype)
-            if rank:
-                query += " AND rank = %s"
-                params.append(rank)
-            
-            cursor.execute(query, params)
-            return cursor.fetchall()
-
-        data_found = False
-
-        if direction_n >= 1:
-            rows = fetch_scores(1)
-            if rows:
-                data_found = True
-                scores = [row[1] for row in rows]
-                sectors = [index_map.get(row[0], f"Index_{row[0]}") for row in rows]
-                result[f"{table_prefix}_1_scores"] = scores
-                result[f"{table_prefix}_1_sectors"] = sectors
-                for index_id, score in rows:
-                    df_data.append({
-                        'month': month,
-                        'year': year,
-                        'type': f"{table_prefix}_1",
-                        'score': score,
-                        'sector': index_map.get(index_id, f"Index_{index_id}")
-                    })
-            else:
-                result[f"{table_prefix}_1_scores"] = []
-                result[f"{table_prefix}_1_sectors"] = []
-
-        if direction_n >= 2:
-            rows = fetch_scores(2, rank=2)
-            if rows:
-                data_found = True
-                scores = [row[1] for row in rows]
-                sectors = [index_map.get(row[0], f"Index_{row[0]}") for row in rows]
-                result[f"{table_prefix}_2_scores"] = scores
-                result[f"{table_prefix}_2_sectors"] = sectors
-                for index_id, score in rows:
-                    df_data.append({
-                        'month': month,
-                        'year': year,
-                        'type': f"{table_prefix}_2",
-                        'score': score,
-                        'sector': index_map.get(index_id, f"Index_{index_id}")
-                    })
-            else:
-                result[f"{table_prefix}_2_scores"] = []
-                result[f"{table_prefix}_2_sectors"] = []
-
-        if direction_n == 3:
-            rows = fetch_scores(3, rank=3)
-            if rows:
-                data_found = True
-                scores = [row[1] for row in rows]
-                sectors = [index_map.get(row[0], f"Index_{row[0]}") for row in rows]
-                result[f"{table_prefix}_3_scores"] = scores
-                result[f"{table_prefix}_3_sectors"] = sectors
-                for index_id, score in rows:
-                    df_data.append({
-                        'month': month,
-                        'year': year,
-                        'type': f"{table_prefix}_3",
-                        'score': score,
-                        'sector': index_map.get(index_id, f"Index_{index_id}")
-                    })
-            else:
-                result[f"{table_prefix}_3_scores"] = []
-                result[f"{table_prefix}_3_sectors"] = []
+        month_filter, month_params = month_predicate(year, month)
+        cursor.execute(*topbottom_scores_query(table_prefix, direction_n, month_filter, month_params, subtype))
+        rows = cursor.fetchall()
 
-        if not data_found:
-            message = f"No data found for {table_prefix} scores in {month}/{year}"
-            if subtype:
-                message += f" with subtype '{subtype}'"
-            result['message'] = message
+        cursor.close()
 
+        result, df_data = topbottom_result(month, year, table_prefix, subtype, direction_n, index_map, rows)
         df = pd.DataFrame(df_data)
 
-        cursor.close()
-        conn.close()
-
         if file_format == 'json':
             return jsonify(result)
         else:
@@ -1057,65 +1298,28 @@ def get_topbottom_scores_by_range():
         valid_subtypes = ['n1', 'n2', 'n3', 'b1', 'b2', 'b3', '']
         if subtype not in valid_subtypes:
             raise BadRequest("Subtype must be one of 'n1', 'n2', 'n3', 'b1', 'b2', 'b3', or empty")
-        if file_format not in ['json', 'excel', 'csv']:
-            raise BadRequest("file_format must be 'json', 'excel', or 'csv'")
+        if file_format not in ['json'] + FILE_FORMATS:
+            raise BadRequest("file_format must be 'json', 'excel', 'csv', 'parquet' or 'arrow'")
 
         conn = get_db_connection()
         cursor = conn.cursor()
 
         table_prefix = 'top' if direction == 'top' else 'bottom'
 
-        cursor.execute("SELECT index_id, index_name FROM indices")
-        index_map = {row[0]: row[1] for row in cursor.fetchall()}
-
-        def fetch_scores(table_num, rank=None):
-            table_name = f"{table_prefix}_{table_num}_scores"
-            query = f"""
-                SELECT EXTRACT(YEAR FROM trade_date) AS year,
-                       EXTRACT(MONTH FROM trade_date) AS month,
-                       sectoral_index_id, score_value
-                FROM {table_name}
-                WHERE trade_date >= %s
-                AND trade_date <= %s
-            """
-            params = [start_date, end_date]
-            if subtype:
-                query += " AND score_type = %s"
-                params.append(subtype)
-            if rank:
-                query += " AND rank = %s"
-                params.append(rank)
-            
-            cursor.execute(query, params)
-            return cursor.fetchall()
+        index_map = index_names(cursor)
+
+        # Every table's rows in one round trip, tagged with the table they came from
+        date_filter, date_params = date_range_predicate(start_date, end_date)
+        columns = """EXTRACT(YEAR FROM trade_date) AS year,
+                   EXTRACT(MONTH FROM trade_date) AS month,
+                   sectoral_index_id, score_value"""
+        cursor.execute(*topbottom_scores_query(table_prefix, direction_n, date_filter, date_params, subtype, columns))
 
         data_by_month = {}
-        if direction_n >= 1:
-            rows = fetch_scores(1)
-            for year, month, index_id, score in rows:
-                key = (int(year), int(month))
-                if key not in data_by_month:
-                    data_by_month[key] = {'top_1_scores': [], 'top_1_sectors': []}
-                data_by_month[key]['top_1_scores'].append(score)
-                data_by_month[key]['top_1_sectors'].append(index_map.get(index_id, f"Index_{index_id}"))
-
-        if direction_n >= 2:
-            rows = fetch_scores(2, rank=2)
-            for year, month, index_id, score in rows:
-                key = (int(year), int(month))
-                if key not in data_by_month:
-                    data_by_month[key] = {'top_1_scores': [], 'top_1_sectors': []}
-                data_by_month[key]['top_2_scores'] = data_by_month[key].get('top_2_scores', []) + [score]
-                data_by_month[key]['top_2_sectors'] = data_by_month[key].get('top_2_sectors', []) + [index_map.get(index_id, f"Index_{index_id}")]
-
-        if direction_n == 3:
-            rows = fetch_scores(3, rank=3)
-            for year, month, index_id, score in rows:
-                key = (int(year), int(month))
-                if key not in data_by_month:
-                    data_by_month[key] = {'top_1_scores': [], 'top_1_sectors': []}
-                data_by_month[key]['top_3_scores'] = data_by_month[key].get('top_3_scores', []) + [score]
-                data_by_month[key]['top_3_sectors'] = data_by_month[key].get('top_3_sectors', []) + [index_map.get(index_id, f"Index_{index_id}")]
+        for table_num, year, month, index_id, score in cursor.fetchall():
+            data = data_by_month.setdefault((int(year), int(month)), {'top_1_scores': [], 'top_1_sectors': []})
+            data.setdefault(f'top_{table_num}_scores', []).append(score)
+            data.setdefault(f'top_{table_num}_sectors', []).append(index_map.get(index_id, f"Index_{index_id}"))
 
         result = {'start_date': start_date.strftime('%Y-%m-%d'), 'end_date': end_date.strftime('%Y-%m-%d')}
         if subtype:
@@ -1144,7 +1348,6 @@ def get_topbottom_scores_by_range():
         df = pd.DataFrame(df_data)
 
         cursor.close()
-        conn.close()
 
         if file_format == 'json':
             for entry in df_data:
@@ -1169,6 +1372,7 @@ def get_topbottom_scores_by_range():
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
 @app.route('/api/ratio_data', methods=['GET'])
+@cached_response('ratio_choice', 'file_format')
 def get_ratio_data():
     try:
         ratio_choice = request.args.get('ratio_choice', 'n1').lower()
@@ -1177,8 +1381,8 @@ def get_ratio_data():
         valid_ratios = ['n1', 'n2', 'n3', 'b1', 'b2', 'b3']
         if ratio_choice not in valid_ratios:
             raise BadRequest(f"Invalid ratio choice. Must be one of {valid_ratios}")
-        if file_format not in ['json', 'excel', 'csv']:
-            raise BadRequest("file_format must be 'json', 'excel', or 'csv'")
+        if file_format not in ['json'] + FILE_FORMATS:
+            raise BadRequest("file_format must be 'json', 'excel', 'csv', 'parquet' or 'arrow'")
 
         table_name = 'n_ratios' if ratio_choice.startswith('n') else 'b_ratios'
 
@@ -1228,7 +1432,6 @@ def get_ratio_data():
             result['data'] = {date: {index_mapping[idx]: val for idx, val in monthly_data[date].items()} for date in dates}
 
         cursor.close()
-        conn.close()
 
         if file_format == 'json':
             return jsonify(result)
@@ -1259,8 +1462,8 @@ def get_ratio_data_by_range():
         valid_ratios = ['n1', 'n2', 'n3', 'b1', 'b2', 'b3']
         if ratio_choice not in valid_ratios:
             raise BadRequest(f"Invalid ratio choice. Must be one of {valid_ratios}")
-        if file_format not in ['json', 'excel', 'csv']:
-            raise BadRequest("file_format must be 'json', 'excel', or 'csv'")
+        if file_format not in ['json'] + FILE_FORMATS:
+            raise BadRequest("file_format must be 'json', 'excel', 'csv', 'parquet' or 'arrow'")
 
         table_name = 'n_ratios' if ratio_choice.startswith('n') else 'b_ratios'
 
@@ -1276,6 +1479,7 @@ def get_ratio_data_by_range():
         indices = cursor.fetchall()
         index_mapping = {idx[0]: idx[1] for idx in indices}
 
+        date_filter, date_params = date_range_predicate(start_date, end_date)
         query = f"""
             SELECT 
                 trade_date,
@@ -1283,11 +1487,22 @@ def get_ratio_data_by_range():
                 {ratio_choice}
             FROM {table_name}
             WHERE {ratio_choice} IS NOT NULL
-            AND trade_date >= %s
-            AND trade_date <= %s
+            AND {date_filter}
             ORDER BY trade_date, sectoral_index_id
         """
-        cursor.execute(query, (start_date, end_date))
+        if file_format == 'csv' and stream_requested():
+            cursor.close()
+            # Pivot one month at a time as the ordered rows arrive
+            def monthly_rows():
+                rows = iter_query(conn, query, date_params)
+                for month, month_rows in groupby(rows, key=lambda row: row[0].strftime('%Y-%m')):
+                    values = {index_id: ratio_value for _, index_id, ratio_value in month_rows}
+                    yield [month] + [values.get(index_id) for index_id in index_mapping]
+            return generate_csv_stream(
+                ['trade_date'] + list(index_mapping.values()), monthly_rows(),
+                f"monthly_{ratio_choice}_data_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+            )
+        cursor.execute(query, date_params)
         data = cursor.fetchall()
 
         monthly_data = {}
@@ -1316,7 +1531,6 @@ def get_ratio_data_by_range():
             result['data'] = {date: {index_mapping[idx]: val for idx, val in monthly_data[date].items()} for date in dates}
 
         cursor.close()
-        conn.close()
 
         if file_format == 'json':
             return jsonify(result)
@@ -1328,6 +1542,116 @@ def get_ratio_data_by_range():
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+# 2. get_all_scores_forReferences (batch of stocks and dates)
+# Body: {"items": [{"stock": ..., "date": "YYYY-MM-DD"}, ...], "aggregation_method": "max"|"min"|"both"}.
+# Results come back in input order, as JSON or (file_format=arrow) an Arrow IPC stream.
+@app.route('/api/scores/batch', methods=['POST'])
+def get_scores_batch():
+    try:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('items'), list):
+            raise BadRequest("Request body must be a JSON object with an 'items' list")
+        items = body['items']
+        aggregation_method = str(body.get('aggregation_method', 'max')).lower()
+        file_format = request.args.get('file_format', body.get('file_format', 'json'))
+        if not isinstance(file_format, str):
+            raise BadRequest("file_format must be 'json' or 'arrow'")
+        file_format = file_format.lower()
+
+        if not items:
+            raise BadRequest("items must not be empty")
+        if len(items) > BATCH_MAX_ITEMS:
+            raise BadRequest(f"At most {BATCH_MAX_ITEMS} items per request")
+        if aggregation_method not in ['max', 'min', 'both']:
+            raise BadRequest("aggregation_method must be 'max', 'min', or 'both'")
+        if file_format not in ['json', 'arrow']:
+            raise BadRequest("file_format must be 'json' or 'arrow'")
+
+        stocks, months = [], []
+        for position, item in enumerate(items):
+            try:
+                item_date = datetime.strptime(item['date'], '%Y-%m-%d')
+                stocks.append(str(item['stock']))
+            except (KeyError, TypeError, ValueError):
+                raise BadRequest(f"items[{position}] must have 'stock' and a 'date' in YYYY-MM-DD format")
+            months.append(item_date.date().replace(day=1))
+
+        subtypes = ['n1', 'n2', 'n3', 'b1', 'b2', 'b3']
+
+        def month_scores(table, columns):
+            aggregates = ', '.join(f"MAX(r.{c}) AS {c}_max, MIN(r.{c}) AS {c}_min" for c in columns)
+            return f"""
+                SELECT req.ord, {aggregates}
+                FROM req
+                JOIN stock_index_mapping sim ON sim.stock_symbol = req.stock_symbol
+                JOIN {table} r ON r.sectoral_index_id = sim.index_id
+                    AND r.trade_date >= req.month_start
+                    AND r.trade_date < req.month_start + INTERVAL '1 month'
+                GROUP BY req.ord
+            """
+
+        # Every pair is resolved in one statement: the pairs are unnested into a keyed
+        # relation and joined to the mapping and to each ratio table once
+        query = f"""
+            WITH req AS (
+                SELECT * FROM unnest(%s::int[], %s::text[], %s::date[]) AS t(ord, stock_symbol, month_start)
+            ),
+            n AS ({month_scores('n_ratios', subtypes[:3])}),
+            b AS ({month_scores('b_ratios', subtypes[3:])})
+            SELECT {', '.join(f'{c}_max, {c}_min' for c in subtypes)}
+            FROM req
+            LEFT JOIN n USING (ord)
+            LEFT JOIN b USING (ord)
+            ORDER BY req.ord
+        """
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, (list(range(len(items))), stocks, months))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        if file_format == 'arrow':
+            columnar_export.require_pyarrow()
+            pa = columnar_export.pa
+            columns = {'stock': stocks, 'date': [m.strftime('%Y-%m') for m in months]}
+            types = {'stock': pa.string(), 'date': pa.string()}
+            for i, subtype in enumerate(subtypes):
+                max_values = [row[2 * i] for row in rows]
+                min_values = [row[2 * i + 1] for row in rows]
+                if aggregation_method == 'both':
+                    columns[f"{subtype}_max"], columns[f"{subtype}_min"] = max_values, min_values
+                    types[f"{subtype}_max"] = types[f"{subtype}_min"] = pa.int32()
+                else:
+                    columns[subtype] = max_values if aggregation_method == 'max' else min_values
+                    types[subtype] = pa.int32()
+            output = io.BytesIO()
+            columnar_export.write_table(columnar_export.table_from_columns(columns, types), output, 'arrow')
+            return Response(output.getvalue(), mimetype=columnar_export.MIMETYPES['arrow'])
+
+        results = [{"stock": stock, "date": month.strftime('%Y-%m'), "scores": subtype_scores(row, aggregation_method)}
+                   for stock, month, row in zip(stocks, months, rows)]
+
+        return jsonify({"results": results})
+
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except psycopg2.Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+@app.route('/api/db_pool_metrics', methods=['GET'])
+def get_db_pool_metrics():
+    return jsonify(db_pool.metrics())
+
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
 if __name__ == '__main__':
     port = int(os.environ.get('FLASK_PORT', 8080))
+    if SCORE_CUBE:
+        # Start loading the cube now rather than on the first request
+        score_cubes.get(data_generations.current())
     app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,84 @@
+import sys
+import time
+import random
+from datetime import date
+from decimal import Decimal
+
+import psycopg2
+
+from bulk_upsert import bulk_upsert
+
+# Compares per-row INSERT ... ON CONFLICT against bulk_upsert on a scratch copy of n_ratios.
+# Usage: python benchmark_bulk_upsert.py [rows]
+DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+
+COLUMNS = ('trade_date', 'sectoral_index_id', 'benchmark_index_id',
+           'open_ratio', 'high_ratio', 'low_ratio', 'close_ratio', 'tag', 'n1', 'n2', 'n3')
+KEY = ('trade_date', 'sectoral_index_id', 'benchmark_index_id')
+
+PER_ROW_SQL = """
+    INSERT INTO bench_n_ratios (trade_date, sectoral_index_id, benchmark_index_id,
+                                open_ratio, high_ratio, low_ratio, close_ratio,
+                                tag, n1, n2, n3)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (trade_date, sectoral_index_id, benchmark_index_id) DO UPDATE
+    SET open_ratio = EXCLUDED.open_ratio,
+        high_ratio = EXCLUDED.high_ratio,
+        low_ratio = EXCLUDED.low_ratio,
+        close_ratio = EXCLUDED.close_ratio,
+        tag = EXCLUDED.tag,
+        n1 = EXCLUDED.n1,
+        n2 = EXCLUDED.n2,
+        n3 = EXCLUDED.n3
+"""
+
+def make_rows(count: int, seed: int):
+    rng = random.Random(seed)
+    tags = ["Highly Bullish", "Bullish", "Bearish", "Highly Bearish"]
+    rows = []
+    for i in range(count):
+        year, month = divmod(i // 60, 12)
+        ratio = [Decimal(f"{rng.uniform(0.2, 3):.8f}") for _ in range(4)]
+        rows.append((date(2000 + year, month + 1, 28), i % 60 + 1, 1, *ratio, rng.choice(tags),
+                     rng.randint(-2, 2), rng.randint(-4, 4), rng.randint(-6, 6)))
+    return rows
+
+def per_row_write(cur, rows):
+    for row in rows:
+        cur.execute(PER_ROW_SQL, row)
+
+def bulk_write(cur, rows):
+    bulk_upsert(cur, 'bench_n_ratios', COLUMNS, KEY, rows)
+
+def run(count: int):
+    with psycopg2.connect(DEFAULT_DB_URL) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE bench_n_ratios (
+                    trade_date TIMESTAMPTZ NOT NULL,
+                    sectoral_index_id INT NOT NULL,
+                    benchmark_index_id INT NOT NULL,
+                    open_ratio DECIMAL(15, 8) NOT NULL,
+                    high_ratio DECIMAL(15, 8) NOT NULL,
+                    low_ratio DECIMAL(15, 8) NOT NULL,
+                    close_ratio DECIMAL(15, 8) NOT NULL,
+                    tag VARCHAR(20),
+                    n1 INT, n2 INT, n3 INT,
+                    UNIQUE (trade_date, sectoral_index_id, benchmark_index_id)
+                )
+            """)
+            print(f"{'writer':<10} {'pass':<8} {'rows':>8} {'seconds':>9} {'rows/s':>10}")
+            for name, writer in [('per-row', per_row_write), ('bulk', bulk_write)]:
+                # First pass inserts into an empty table, second pass updates every row
+                cur.execute("TRUNCATE bench_n_ratios")
+                conn.commit()
+                for label, seed in [('insert', 1), ('update', 2)]:
+                    rows = make_rows(count, seed)
+                    started = time.perf_counter()
+                    writer(cur, rows)
+                    conn.commit()
+                    elapsed = time.perf_counter() - started
+                    print(f"{name:<10} {label:<8} {count:>8} {elapsed:>9.3f} {count / elapsed:>10.0f}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,69 @@
+import time
+import tracemalloc
+from datetime import date
+
+import psycopg2
+
+from monthly_ohlc_refresh import fetch_monthly_rows
+from score3 import Candle, CandleSeries
+
+# Memory and conversion cost of the monthly candles of every index in monthly_ohlc,
+# held as plain Candle objects, __slots__ Candles and one CandleSeries per index.
+DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+
+class DictCandle:
+    """The previous Candle layout: the same attributes in a per-instance __dict__."""
+    def __init__(self, trade_date, open_price, high, low, close):
+        self.trade_date = trade_date
+        self.open = open_price
+        self.high = high
+        self.low = low
+        self.close = close
+        self.tag = None
+        self.n1 = self.n2 = self.n3 = None
+        self.b1 = self.b2 = self.b3 = None
+
+def group_rows(rows):
+    by_index = {}
+    for row in rows:
+        by_index.setdefault(row[0], []).append(row)
+    return by_index
+
+def as_candles(by_index, cls):
+    return {index_id: {f"{r[1].year}-{r[1].month:02d}": cls(*r[1:]) for r in rows}
+            for index_id, rows in by_index.items()}
+
+def as_series(by_index):
+    return {index_id: CandleSeries([r[1] for r in rows], [r[2:] for r in rows])
+            for index_id, rows in by_index.items()}
+
+def measure(label, build):
+    """Build once under tracemalloc for the retained size, then time a second build."""
+    tracemalloc.start()
+    built = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    started = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {retained / 1024:>10.1f} {elapsed * 1000:>10.1f}")
+    return built
+
+def run():
+    with psycopg2.connect(DEFAULT_DB_URL) as conn:
+        with conn.cursor() as cur:
+            by_index = group_rows(fetch_monthly_rows(cur, date.max))
+    candles = sum(len(rows) for rows in by_index.values())
+    print(f"{len(by_index)} indices, {candles} monthly candles")
+    print(f"{'representation':<32} {'KiB':>10} {'build ms':>10}")
+
+    measure("dict Candle (previous)", lambda: as_candles(by_index, DictCandle))
+    slotted = measure("__slots__ Candle", lambda: as_candles(by_index, Candle))
+    series = measure("CandleSeries", lambda: as_series(by_index))
+
+    candle_lists = {index_id: list(months.values()) for index_id, months in slotted.items()}
+    measure("Candle -> CandleSeries", lambda: {i: CandleSeries.from_candles(c) for i, c in candle_lists.items()})
+    measure("CandleSeries -> Candle", lambda: {i: s.to_candles('n') for i, s in series.items()})
+
+if __name__ == "__main__":
+    run()
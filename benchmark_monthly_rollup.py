@@ -0,0 +1,124 @@
+import sys
+import time
+
+import psycopg2
+
+# Compares monthly OHLC aggregation strategies on a synthetic daily table.
+# Usage: python benchmark_monthly_rollup.py [indices] [years]
+DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+
+# Previous per-index query: window functions over every daily row plus a correlated MAX(trade_date)
+WINDOW_SQL = """
+    WITH monthly_data AS (
+        SELECT EXTRACT(YEAR FROM trade_date) AS year,
+               EXTRACT(MONTH FROM trade_date) AS month,
+               trade_date,
+               FIRST_VALUE(open_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date) ORDER BY trade_date) AS open_price,
+               MAX(high_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date)) AS high_price,
+               MIN(low_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date)) AS low_price,
+               LAST_VALUE(close_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date) ORDER BY trade_date
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS close_price
+        FROM bench_daily_ohlc
+        WHERE index_id = %s
+    )
+    SELECT %s, trade_date, open_price, high_price, low_price, close_price
+    FROM monthly_data
+    WHERE trade_date = (SELECT MAX(trade_date) FROM monthly_data md2
+                      WHERE md2.year = monthly_data.year AND md2.month = monthly_data.month)
+"""
+
+ARRAY_AGG_SQL = """
+    SELECT index_id,
+           MAX(trade_date),
+           (array_agg(open_price ORDER BY trade_date))[1],
+           MAX(high_price),
+           MIN(low_price),
+           (array_agg(close_price ORDER BY trade_date DESC))[1]
+    FROM bench_daily_ohlc
+    GROUP BY index_id, date_trunc('month', trade_date)
+"""
+
+DISTINCT_ON_SQL = """
+    WITH firsts AS (
+        SELECT DISTINCT ON (index_id, date_trunc('month', trade_date))
+               index_id, date_trunc('month', trade_date) AS month, open_price
+        FROM bench_daily_ohlc
+        ORDER BY index_id, date_trunc('month', trade_date), trade_date
+    ), lasts AS (
+        SELECT DISTINCT ON (index_id, date_trunc('month', trade_date))
+               index_id, date_trunc('month', trade_date) AS month, trade_date, close_price
+        FROM bench_daily_ohlc
+        ORDER BY index_id, date_trunc('month', trade_date), trade_date DESC
+    ), extremes AS (
+        SELECT index_id, date_trunc('month', trade_date) AS month,
+               MAX(high_price) AS high_price, MIN(low_price) AS low_price
+        FROM bench_daily_ohlc
+        GROUP BY index_id, date_trunc('month', trade_date)
+    )
+    SELECT l.index_id, l.trade_date, f.open_price, e.high_price, e.low_price, l.close_price
+    FROM lasts l
+    JOIN firsts f USING (index_id, month)
+    JOIN extremes e USING (index_id, month)
+"""
+
+def create_synthetic_daily(cur, indices: int, years: int):
+    """Random-walk daily candles for every index over `years` years of weekdays."""
+    cur.execute("""
+        CREATE TEMP TABLE bench_daily_ohlc AS
+        WITH days AS (
+            SELECT d::date AS trade_date
+            FROM generate_series(DATE '2025-01-01' - make_interval(years => %s), DATE '2024-12-31', INTERVAL '1 day') d
+            WHERE EXTRACT(ISODOW FROM d) < 6
+        ), walk AS (
+            SELECT i AS index_id, trade_date,
+                   1000 * exp(SUM(ln(1 + (random() - 0.5) / 50)) OVER (PARTITION BY i ORDER BY trade_date)) AS close_price
+            FROM generate_series(1, %s) i CROSS JOIN days
+        )
+        SELECT trade_date, index_id,
+               ROUND((COALESCE(LAG(close_price) OVER w, close_price))::numeric, 4) AS open_price,
+               ROUND((close_price * 1.01)::numeric, 4) AS high_price,
+               ROUND((close_price * 0.99)::numeric, 4) AS low_price,
+               ROUND(close_price::numeric, 4) AS close_price
+        FROM walk
+        WINDOW w AS (PARTITION BY index_id ORDER BY trade_date)
+    """, (years, indices))
+    cur.execute("CREATE UNIQUE INDEX ON bench_daily_ohlc (index_id, trade_date)")
+    cur.execute("ANALYZE bench_daily_ohlc")
+    cur.execute("SELECT COUNT(*) FROM bench_daily_ohlc")
+    return cur.fetchone()[0]
+
+def timed(label, func):
+    started = time.perf_counter()
+    rows = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {len(rows):>8} {elapsed:>9.3f}")
+    return sorted(tuple(r) for r in rows)
+
+def run(indices: int, years: int):
+    with psycopg2.connect(DEFAULT_DB_URL) as conn:
+        with conn.cursor() as cur:
+            daily_rows = create_synthetic_daily(cur, indices, years)
+            print(f"bench_daily_ohlc: {daily_rows} rows, {indices} indices, {years} years")
+            print(f"{'strategy':<28} {'months':>8} {'seconds':>9}")
+
+            def window_per_index():
+                rows = []
+                for index_id in range(1, indices + 1):
+                    cur.execute(WINDOW_SQL, (index_id, index_id))
+                    rows.extend(cur.fetchall())
+                return rows
+
+            def single_statement(sql):
+                cur.execute(sql)
+                return cur.fetchall()
+
+            results = [
+                timed("window + correlated MAX", window_per_index),
+                timed("array_agg rollup", lambda: single_statement(ARRAY_AGG_SQL)),
+                timed("DISTINCT ON rollup", lambda: single_statement(DISTINCT_ON_SQL)),
+            ]
+            print("results match:", all(r == results[0] for r in results[1:]))
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 60,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 12)
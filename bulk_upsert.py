@@ -0,0 +1,99 @@
+import io
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Sequence
+
+DEFAULT_BATCH_SIZE = 50000
+
+def _copy_value(value) -> str:
+    """Format one value for COPY ... FROM STDIN text format."""
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    text = str(value)
+    return (text.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+
+def _copy_buffer(rows: Sequence[Sequence]) -> io.StringIO:
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    return buf
+
+def copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+              batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """COPY rows, tuples in `columns` order, into an existing table. Returns the number of rows."""
+    column_list = ", ".join(columns)
+    total = 0
+    batch: List[Sequence] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cur.copy_expert(f"COPY {table} ({column_list}) FROM STDIN", _copy_buffer(batch))
+            total += len(batch)
+            batch = []
+    if batch:
+        cur.copy_expert(f"COPY {table} ({column_list}) FROM STDIN", _copy_buffer(batch))
+        total += len(batch)
+    return total
+
+def bulk_upsert(cur, table: str, columns: Sequence[str], conflict_columns: Sequence[str],
+                rows: Iterable[Sequence], update_columns: Optional[Sequence[str]] = None,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Upsert rows into `table` by COPYing them into a temp staging table and merging
+    with one INSERT ... SELECT ... ON CONFLICT per batch.
+
+    Rows are tuples in `columns` order. `update_columns` defaults to every column not in
+    `conflict_columns`; pass an empty list for ON CONFLICT DO NOTHING. When a batch holds
+    the same key twice the later row wins, as it would with one INSERT per row.
+    The caller owns the transaction. Returns the number of rows staged.
+    """
+    if update_columns is None:
+        update_columns = [c for c in columns if c not in conflict_columns]
+    staging = f"_stage_{table}"
+    column_list = ", ".join(columns)
+    key_list = ", ".join(conflict_columns)
+
+    cur.execute(f"DROP TABLE IF EXISTS {staging}")
+    cur.execute(f"CREATE TEMP TABLE {staging} AS SELECT {column_list} FROM {table} WITH NO DATA")
+    cur.execute(f"ALTER TABLE {staging} ADD COLUMN _stage_seq BIGSERIAL")
+
+    if update_columns:
+        conflict_action = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in update_columns)
+    else:
+        conflict_action = "DO NOTHING"
+    merge_sql = f"""
+        INSERT INTO {table} ({column_list})
+        SELECT DISTINCT ON ({key_list}) {column_list}
+        FROM {staging}
+        ORDER BY {key_list}, _stage_seq DESC
+        ON CONFLICT ({key_list}) {conflict_action}
+    """
+
+    total = 0
+    batch: List[Sequence] = []
+
+    def flush():
+        cur.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN", _copy_buffer(batch))
+        cur.execute(merge_sql)
+        cur.execute(f"TRUNCATE {staging}")
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+            total += len(batch)
+            batch = []
+    if batch:
+        flush()
+        total += len(batch)
+
+    cur.execute(f"DROP TABLE {staging}")
+    return total
@@ -0,0 +1,65 @@
+import json
+from typing import Dict, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only the parquet and arrow formats need it
+    pa = None
+    pq = None
+
+# Parquet and Arrow IPC stream output for score panels. Score columns are written as nullable
+# int32, built straight from their Python values, so readers get typed columns back.
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+MIMETYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrows'}
+SCORE_COLUMNS = ('n1', 'n2', 'n3', 'b1', 'b2', 'b3')
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("The parquet and arrow formats need pyarrow; install it with `pip install pyarrow`")
+
+def score_array(values: Sequence[Optional[int]]):
+    """Nullable int32 array of scores; None stays null instead of becoming NaN."""
+    return pa.array([None if value is None else int(value) for value in values], type=pa.int32())
+
+def table_from_columns(columns: Dict[str, Sequence], types: Dict[str, object]):
+    """Arrow table from lists of Python values, one pyarrow type per column."""
+    require_pyarrow()
+    return pa.table({name: pa.array(values, type=types[name]) for name, values in columns.items()})
+
+def dataframe_to_table(df, score_columns: Sequence[str] = SCORE_COLUMNS):
+    """
+    Arrow table for `df`. Score columns become int32 and other columns keep the type pyarrow
+    infers; a column of mixed Python objects (e.g. a score that is an int or a {'max', 'min'}
+    dict) is written as JSON text.
+    """
+    require_pyarrow()
+    arrays = {}
+    for name in df.columns:
+        series = df[name]
+        if name in score_columns and series.dtype == object:
+            arrays[str(name)] = score_array(series.tolist())
+            continue
+        try:
+            arrays[str(name)] = pa.Array.from_pandas(series)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays[str(name)] = pa.array(
+                [None if value is None else json.dumps(value, default=str) for value in series],
+                type=pa.string()
+            )
+    return pa.table(arrays)
+
+def write_table(table, sink, file_format: str) -> None:
+    """Write `table` to a path or binary buffer as a parquet file or an Arrow IPC stream."""
+    require_pyarrow()
+    if file_format == 'parquet':
+        pq.write_table(table, sink)
+    elif file_format == 'arrow':
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Unknown columnar format {file_format!r}; use one of {COLUMNAR_FORMATS}")
@@ -0,0 +1,36 @@
+import csv
+import io
+import uuid
+from typing import Iterable, Iterator, Optional, Sequence
+
+# Incremental CSV export. Rows come from a server-side (named) cursor `itersize` at a time and
+# are formatted into chunks as they arrive, so memory stays flat however many rows there are.
+DEFAULT_ITERSIZE = 5000
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+def iter_query(conn, query: str, params: Optional[Sequence] = None,
+               itersize: int = DEFAULT_ITERSIZE) -> Iterator[tuple]:
+    """Rows of `query` from a named cursor on `conn`, fetched `itersize` rows per round trip."""
+    with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cur:
+        cur.itersize = itersize
+        cur.execute(query, params)
+        yield from cur
+
+def csv_chunks(header: Sequence[str], rows: Iterable[Sequence],
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """CSV text for `header` and `rows` in chunks of about `chunk_size` characters."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(header)
+    # The header goes out before the query runs, so the first byte does not wait for it
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= chunk_size:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
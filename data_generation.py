@@ -0,0 +1,78 @@
+import threading
+import time
+from typing import Callable, Tuple
+
+import psycopg2
+
+from response_cache import notify_scores_changed
+
+# One generation counter per score table, bumped by the jobs in the same transaction as their
+# writes. The API reads the counters (throttled by GenerationReader) and folds them into its
+# response cache keys and ETags, so a changed table changes every dependent key and ETag.
+DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+
+def create_generation_table() -> None:
+    try:
+        with psycopg2.connect(DEFAULT_DB_URL) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS data_generation (
+                        table_name TEXT PRIMARY KEY,
+                        generation BIGINT NOT NULL,
+                        committed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    );
+                """)
+                conn.commit()
+    except psycopg2.Error as e:
+        print(f"Error creating data_generation table: {e}")
+
+def bump_generation(cur, *tables: str) -> None:
+    """
+    Advance the generation of each table, then notify the API caches. Call it last, just before
+    the commit: the rows stay locked until then, so concurrent writers of a table queue briefly.
+    """
+    cur.execute("""
+        INSERT INTO data_generation (table_name, generation, committed_at)
+        SELECT t, 1, now() FROM unnest(%s::text[]) t
+        ON CONFLICT (table_name) DO UPDATE
+        SET generation = data_generation.generation + 1,
+            committed_at = EXCLUDED.committed_at
+    """, (sorted(set(tables)),))
+    notify_scores_changed(cur)
+
+def fetch_generations(cur) -> Tuple[Tuple[str, int], ...]:
+    cur.execute("SELECT table_name, generation FROM data_generation ORDER BY table_name")
+    return tuple(cur.fetchall())
+
+class GenerationReader:
+    """
+    The current generations, read through `connection` (a callable returning a connection
+    context manager) at most once every `interval` seconds. While one thread re-reads, the
+    others keep using the previous value.
+    """
+    def __init__(self, connection: Callable, interval: float = 5.0):
+        self.connection = connection
+        self.interval = interval
+        self._generations: Tuple[Tuple[str, int], ...] = ()
+        self._read_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def current(self) -> Tuple[Tuple[str, int], ...]:
+        if time.monotonic() - self._read_at >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                with self.connection() as conn:
+                    with conn.cursor() as cur:
+                        self._generations = fetch_generations(cur)
+            except psycopg2.Error as e:
+                print(f"Error reading data_generation: {e}")
+            finally:
+                self._read_at = time.monotonic()
+                self._lock.release()
+        return self._generations
+
+if __name__ == "__main__":
+    create_generation_table()
+    with psycopg2.connect(DEFAULT_DB_URL) as conn:
+        with conn.cursor() as cur:
+            for table_name, generation in fetch_generations(cur):
+                print(f"{table_name:<16} {generation}")
@@ -0,0 +1,22 @@
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+# Builders for trade_date filters. They emit half-open ranges (column >= start AND column < end)
+# that can use an index on trade_date, unlike EXTRACT(YEAR/MONTH FROM trade_date) = %s.
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+def month_range(year: int, month: int) -> Tuple[date, date]:
+    """First day of the month and first day of the following month."""
+    start = date(year, month, 1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+def month_predicate(year: int, month: int, column: str = 'trade_date') -> Tuple[str, List[date]]:
+    """SQL filter and parameters selecting one calendar month of `column`."""
+    start, end = month_range(year, month)
+    return f"{column} >= %s AND {column} < %s", [start, end]
+
+def date_range_predicate(start, end, column: str = 'trade_date') -> Tuple[str, List[date]]:
+    """SQL filter and parameters selecting the calendar days start..end, both inclusive."""
+    return f"{column} >= %s AND {column} < %s", [_as_date(start), _as_date(end) + timedelta(days=1)]
@@ -0,0 +1,98 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from psycopg2.pool import ThreadedConnectionPool
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's checkout timeout."""
+
+class ConnectionPool:
+    """
+    Process-wide psycopg2 ThreadedConnectionPool with a blocking, context-managed checkout.
+
+    ThreadedConnectionPool raises as soon as maxconn connections are out; here callers wait
+    up to `timeout` seconds for one to come back instead. The underlying pool is created on
+    first use so importing a module that owns a pool does not connect.
+    """
+    def __init__(self, dsn: str, minconn: int = 1, maxconn: int = 10, timeout: float = 30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._in_use = 0
+        self._max_in_use = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._exhausted = 0
+        self._timeouts = 0
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, self.dsn)
+            return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection and always return it, rolled back, when the block exits."""
+        started = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            # Every connection is in use; count it and wait for one to be returned
+            with self._lock:
+                self._exhausted += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeout(f"No database connection free after {self.timeout}s")
+        try:
+            conn = self._get_pool().getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._max_in_use = max(self._max_in_use, self._in_use)
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            yield conn
+        finally:
+            broken = bool(conn.closed)
+            if not broken:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            self._get_pool().putconn(conn, close=broken)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'in_use': self._in_use,
+                'max_in_use': self._max_in_use,
+                'checkouts': self._checkouts,
+                'wait_seconds_total': round(self._wait_total, 6),
+                'wait_seconds_avg': round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+                'wait_seconds_max': round(self._wait_max, 6),
+                'exhaustion_events': self._exhausted,
+                'timeouts': self._timeouts,
+            }
+
+    def closeall(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
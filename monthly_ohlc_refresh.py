@@ -0,0 +1,113 @@
+import argparse
+import psycopg2
+from datetime import date
+from typing import List, Optional
+
+# Keeps monthly_ohlc current from daily_ohlc. Run it after each daily load; the scorers
+# (score.py, score2.py, score3.py) read monthly bars from monthly_ohlc only.
+DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+
+def create_watermark_table(cur) -> None:
+    """High-water mark of the daily_ohlc rows already rolled into monthly_ohlc, per index."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS monthly_ohlc_watermark (
+            index_id INT PRIMARY KEY,
+            last_trade_date TIMESTAMPTZ NOT NULL,
+            refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            FOREIGN KEY (index_id) REFERENCES indices(index_id) ON DELETE CASCADE
+        );
+    """)
+
+def refresh_monthly_ohlc(full: bool = False, conn=None) -> int:
+    """
+    Recompute the monthly_ohlc months touched by daily rows newer than each index's
+    watermark, then advance the watermarks, all in one transaction. With full set the
+    watermarks are cleared first so every month is rebuilt. Returns the months written.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = psycopg2.connect(DEFAULT_DB_URL)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                create_watermark_table(cur)
+                if full:
+                    cur.execute("DELETE FROM monthly_ohlc_watermark")
+
+                # New daily rows per index, found with an index range scan past the watermark
+                cur.execute("""
+                    CREATE TEMP TABLE _refresh_months ON COMMIT DROP AS
+                    SELECT i.index_id,
+                           date_trunc('month', n.first_new) AS from_month,
+                           n.last_new AS last_trade_date
+                    FROM indices i
+                    LEFT JOIN monthly_ohlc_watermark w ON w.index_id = i.index_id
+                    CROSS JOIN LATERAL (
+                        SELECT MIN(d.trade_date) AS first_new, MAX(d.trade_date) AS last_new
+                        FROM daily_ohlc d
+                        WHERE d.index_id = i.index_id
+                        AND d.trade_date > COALESCE(w.last_trade_date, '-infinity')
+                    ) n
+                    WHERE n.last_new IS NOT NULL
+                """)
+
+                # A month's last trading day can move, so its old row is replaced rather than upserted
+                cur.execute("""
+                    DELETE FROM monthly_ohlc m
+                    USING _refresh_months r
+                    WHERE m.index_id = r.index_id AND m.trade_date >= r.from_month
+                """)
+                cur.execute("""
+                    INSERT INTO monthly_ohlc (trade_date, index_id, open_price, high_price, low_price, close_price)
+                    SELECT MAX(d.trade_date),
+                           d.index_id,
+                           (array_agg(d.open_price ORDER BY d.trade_date))[1],
+                           MAX(d.high_price),
+                           MIN(d.low_price),
+                           (array_agg(d.close_price ORDER BY d.trade_date DESC))[1]
+                    FROM daily_ohlc d
+                    JOIN _refresh_months r ON r.index_id = d.index_id AND d.trade_date >= r.from_month
+                    GROUP BY d.index_id, date_trunc('month', d.trade_date)
+                """)
+                months = cur.rowcount
+
+                cur.execute("""
+                    INSERT INTO monthly_ohlc_watermark (index_id, last_trade_date, refreshed_at)
+                    SELECT index_id, last_trade_date, now() FROM _refresh_months
+                    ON CONFLICT (index_id) DO UPDATE
+                    SET last_trade_date = EXCLUDED.last_trade_date,
+                        refreshed_at = EXCLUDED.refreshed_at
+                """)
+                print(f"Refreshed {months} monthly_ohlc rows for {cur.rowcount} indices")
+                return months
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        return 0
+    finally:
+        if own_conn:
+            conn.close()
+
+def fetch_monthly_rows(cur, end_date: date, start_date: Optional[date] = None,
+                       index_ids: Optional[List[int]] = None) -> List[tuple]:
+    """
+    (index_id, trade_date, open, high, low, close) rows of monthly_ohlc up to end_date,
+    from the month of start_date if given, ordered by index and date.
+    """
+    sql = """
+        SELECT index_id, trade_date, open_price, high_price, low_price, close_price
+        FROM monthly_ohlc
+        WHERE trade_date <= %s AND trade_date >= %s
+    """
+    params = [end_date, start_date.replace(day=1) if start_date else date.min]
+    if index_ids is not None:
+        sql += " AND index_id = ANY(%s)"
+        params.append(list(index_ids))
+    sql += " ORDER BY index_id, trade_date"
+    cur.execute(sql, params)
+    return cur.fetchall()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bring monthly_ohlc up to date with daily_ohlc.")
+    parser.add_argument('--full', action='store_true', help="rebuild every month instead of only new ones")
+    args = parser.parse_args()
+    refresh_monthly_ohlc(full=args.full)
@@ -0,0 +1,179 @@
+import argparse
+import psycopg2
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from bulk_upsert import bulk_upsert
+from data_generation import bump_generation, create_generation_table
+
+# Dense ranking of n/b scores into the top_1/2/3 and bottom_1/2/3 score tables, either in one
+# Python pass (populate_rank_tables) or inside PostgreSQL (populate_rank_tables_sql)
+DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+
+RANK_DEPTHS = (1, 2, 3)
+SCORE_TYPES = {'N': ('n1', 'n2', 'n3'), 'B': ('b1', 'b2', 'b3')}
+RANK_CONFLICT_COLUMNS = ('trade_date', 'ratio_type', 'score_type', 'sectoral_index_id')
+
+def rank_columns(depth: int) -> tuple:
+    """Column order of {side}_{depth}_scores rows; the depth 1 tables have no rank column."""
+    columns = ('trade_date', 'ratio_type', 'sectoral_index_id', 'score_type', 'score_value')
+    return columns if depth == 1 else columns + ('rank',)
+
+def fetch_ratio_scores() -> Dict[str, Dict[date, List[Tuple[int, int, int, int]]]]:
+    """
+    Scores of n_ratios and b_ratios in one query, as {ratio_type: {trade_date: [(sectoral_id, s1, s2, s3)]}}.
+    Rows without a first score (n1 or b1) are skipped.
+    """
+    data = {'N': defaultdict(list), 'B': defaultdict(list)}
+    try:
+        with psycopg2.connect(DEFAULT_DB_URL) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT 'N', trade_date, sectoral_index_id, n1, n2, n3 FROM n_ratios WHERE n1 IS NOT NULL
+                    UNION ALL
+                    SELECT 'B', trade_date, sectoral_index_id, b1, b2, b3 FROM b_ratios WHERE b1 IS NOT NULL
+                    ORDER BY 1, 2, 3
+                """)
+                for ratio_type, trade_date, sectoral_id, s1, s2, s3 in cur.fetchall():
+                    data[ratio_type][trade_date].append((sectoral_id, s1, s2, s3))
+    except psycopg2.Error as e:
+        print(f"Error fetching ratio scores: {e}")
+    return data
+
+def dense_ranks(scores: List[Tuple[int, int, int, int]], score_idx: int) -> List[Tuple[int, int, int, int]]:
+    """
+    (sectoral_id, score, top_rank, bottom_rank) for every index with a value for the score type.
+    Ranks are dense over distinct scores: the highest score has top_rank 1, the lowest bottom_rank 1.
+    """
+    entries = [(entry[0], entry[score_idx + 1]) for entry in scores if entry[score_idx + 1] is not None]
+    distinct = sorted({score for _, score in entries})
+    bottom_rank = {score: rank for rank, score in enumerate(distinct, 1)}
+    count = len(distinct)
+    return [(sectoral_id, score, count - bottom_rank[score] + 1, bottom_rank[score])
+            for sectoral_id, score in entries]
+
+def rank_rows(ratio_data: Dict[str, Dict[date, List[Tuple[int, int, int, int]]]],
+              sides: Iterable[str] = ('top', 'bottom')) -> Dict[str, List[tuple]]:
+    """Rows for every {side}_{depth}_scores table, from one ranking per (trade_date, score_type)."""
+    sides = tuple(sides)
+    rows = {f"{side}_{depth}_scores": [] for side in sides for depth in RANK_DEPTHS}
+    for ratio_type, by_date in ratio_data.items():
+        for trade_date, scores in by_date.items():
+            for idx, score_type in enumerate(SCORE_TYPES[ratio_type]):
+                for sectoral_id, score, top_rank, bottom_rank in dense_ranks(scores, idx):
+                    for side, rank in (('top', top_rank), ('bottom', bottom_rank)):
+                        if side not in sides or rank > RANK_DEPTHS[-1]:
+                            continue
+                        for depth in RANK_DEPTHS:
+                            if rank > depth:
+                                continue
+                            row = (trade_date, ratio_type, sectoral_id, score_type, score)
+                            rows[f"{side}_{depth}_scores"].append(row if depth == 1 else row + (rank,))
+    return rows
+
+def populate_rank_tables(sides: Iterable[str] = ('top', 'bottom')) -> None:
+    """Rank n_ratios and b_ratios once and upsert the top and/or bottom 1/2/3 tables in one transaction."""
+    try:
+        rows = rank_rows(fetch_ratio_scores(), sides)
+        with psycopg2.connect(DEFAULT_DB_URL) as conn:
+            with conn.cursor() as cur:
+                for table, table_rows in rows.items():
+                    depth = int(table.split('_')[1])
+                    bulk_upsert(cur, table, rank_columns(depth), RANK_CONFLICT_COLUMNS, table_rows)
+                    print(f"Upserted {len(table_rows)} rows into {table}")
+                bump_generation(cur, *rows)
+                conn.commit()
+    except psycopg2.Error as e:
+        print(f"Error populating tables: {e}")
+
+# n1..b3 unpivoted to one row per score, with dense ranks from the top and the bottom
+RANKED_SCORES_SQL = """
+    WITH scores AS (
+        SELECT r.trade_date, 'N' AS ratio_type, r.sectoral_index_id, s.score_type, s.score_value
+        FROM n_ratios r
+        CROSS JOIN LATERAL (VALUES ('n1', r.n1), ('n2', r.n2), ('n3', r.n3)) s(score_type, score_value)
+        WHERE r.n1 IS NOT NULL AND s.score_value IS NOT NULL
+        UNION ALL
+        SELECT r.trade_date, 'B', r.sectoral_index_id, s.score_type, s.score_value
+        FROM b_ratios r
+        CROSS JOIN LATERAL (VALUES ('b1', r.b1), ('b2', r.b2), ('b3', r.b3)) s(score_type, score_value)
+        WHERE r.b1 IS NOT NULL AND s.score_value IS NOT NULL
+    ), ranked AS (
+        SELECT *,
+               DENSE_RANK() OVER (PARTITION BY trade_date, ratio_type, score_type ORDER BY score_value DESC) AS top_rank,
+               DENSE_RANK() OVER (PARTITION BY trade_date, ratio_type, score_type ORDER BY score_value) AS bottom_rank
+        FROM scores
+    )
+"""
+
+def ranked_select_sql(side: str, depth: int) -> str:
+    """SELECT of the {side}_{depth}_scores rows, in rank_columns order."""
+    rank = "" if depth == 1 else f", {side}_rank"
+    return (RANKED_SCORES_SQL + f"""
+        SELECT trade_date, ratio_type, sectoral_index_id, score_type, score_value{rank}
+        FROM ranked
+        WHERE {side}_rank <= {depth}
+    """)
+
+def populate_rank_tables_sql(sides: Iterable[str] = ('top', 'bottom')) -> None:
+    """Fill the top and/or bottom 1/2/3 tables with one INSERT ... SELECT per table, ranked by PostgreSQL."""
+    try:
+        with psycopg2.connect(DEFAULT_DB_URL) as conn:
+            with conn.cursor() as cur:
+                for side in sides:
+                    for depth in RANK_DEPTHS:
+                        table = f"{side}_{depth}_scores"
+                        columns = rank_columns(depth)
+                        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns[4:])
+                        cur.execute(f"""
+                            INSERT INTO {table} ({", ".join(columns)})
+                            {ranked_select_sql(side, depth)}
+                            ON CONFLICT ({", ".join(RANK_CONFLICT_COLUMNS)}) DO UPDATE SET {updates}
+                        """)
+                        print(f"Upserted {cur.rowcount} rows into {table}")
+                bump_generation(cur, *(f"{side}_{depth}_scores" for side in sides for depth in RANK_DEPTHS))
+                conn.commit()
+    except psycopg2.Error as e:
+        print(f"Error populating tables: {e}")
+
+def check_backends(sides: Iterable[str] = ('top', 'bottom')) -> bool:
+    """Compare the rows both backends would write for every table; prints and returns whether they match."""
+    sides = tuple(sides)
+    python_rows = rank_rows(fetch_ratio_scores(), sides)
+    matched = True
+    try:
+        with psycopg2.connect(DEFAULT_DB_URL) as conn:
+            with conn.cursor() as cur:
+                for table, rows in python_rows.items():
+                    side, depth = table.split('_')[:2]
+                    cur.execute(ranked_select_sql(side, int(depth)))
+                    same = sorted(cur.fetchall()) == sorted(rows)
+                    matched &= same
+                    print(f"{table}: {len(rows)} rows, {'identical' if same else 'DIFFERENT'}")
+    except psycopg2.Error as e:
+        print(f"Error checking backends: {e}")
+        return False
+    return matched
+
+BACKENDS = {'python': populate_rank_tables, 'sql': populate_rank_tables_sql}
+
+def main(backend: str = 'python', check: bool = False):
+    if check:
+        check_backends()
+        return
+    from S_scoreTop3withRank import create_top_scores_tables
+    from S_scoreBottom3withRank import create_bottom_scores_tables
+    create_top_scores_tables()
+    create_bottom_scores_tables()
+    create_generation_table()
+    BACKENDS[backend]()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the top/bottom 1/2/3 score tables.")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='python',
+                        help="rank in Python and bulk upsert, or rank with DENSE_RANK inside PostgreSQL")
+    parser.add_argument('--check', action='store_true',
+                        help="compare both backends' rows instead of writing")
+    args = parser.parse_args()
+    main(args.backend, args.check)
@@ -0,0 +1,105 @@
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import psycopg2
+
+# Size-bounded LRU cache with a TTL for API responses, cleared whenever a scoring or ranking
+# job commits. Jobs call notify_scores_changed(cur) (via data_generation.bump_generation) inside
+# their write transaction; PostgreSQL delivers the NOTIFY at commit to every API process running listen_for_invalidation.
+INVALIDATE_CHANNEL = 'score_data_changed'
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(True, value) for a live entry, marking it most recently used; (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return True, value
+                del self._entries[key]
+                self._expired += 1
+            self._misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+def notify_scores_changed(cur) -> None:
+    """Invalidation hook for the jobs: queue a NOTIFY that is sent only if the transaction commits."""
+    cur.execute(f"NOTIFY {INVALIDATE_CHANNEL}")
+
+def listen_for_invalidation(cache: ResponseCache, dsn: str, channel: str = INVALIDATE_CHANNEL,
+                            retry_seconds: float = 5.0) -> threading.Thread:
+    """
+    Clear `cache` on every NOTIFY on `channel`, from a daemon thread with its own connection.
+    The cache is also cleared whenever the connection is (re)established, since notifications
+    sent while it was down are lost.
+    """
+    def run():
+        while True:
+            conn: Optional[Any] = None
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {channel}")
+                cache.clear()
+                while True:
+                    if select.select([conn], [], [], retry_seconds) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        cache.clear()
+            except psycopg2.Error as e:
+                print(f"Cache invalidation listener error: {e}")
+                cache.clear()
+            finally:
+                if conn is not None:
+                    conn.close()
+            time.sleep(retry_seconds)
+
+    thread = threading.Thread(target=run, name=f"listen-{channel}", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,52 @@
+import gzip
+from typing import Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Negotiated compression of API responses. Only the text payloads (JSON and CSV) are compressed;
+# Excel files are already zip containers and gain nothing.
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/csv')
+
+class ResponseCompressor:
+    def __init__(self, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    @property
+    def encodings(self) -> Tuple[str, ...]:
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self, accept_encodings) -> Optional[str]:
+        """The best encoding the client's Accept-Encoding allows, or None for the identity encoding."""
+        return accept_encodings.best_match(self.encodings)
+
+    def compress_body(self, body: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        # mtime=0 keeps the output, and so cached copies of it, byte-for-byte reproducible
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def compress(self, response, encoding: Optional[str]):
+        """
+        Compress a successful JSON or CSV response in place when its body is at least min_size
+        bytes. Responses that are already encoded, or stream from a generator, are left alone.
+        """
+        if response.status_code != 200 or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        if encoding is None or 'Content-Encoding' in response.headers:
+            return response
+        if response.is_streamed and not response.direct_passthrough:
+            return response
+        # send_file responses stream from their buffer; read it so the body can be replaced
+        response.direct_passthrough = False
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        response.set_data(self.compress_body(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
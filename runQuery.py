@@ -1,14 +1,16 @@
 import psycopg2
 
+from date_filters import month_predicate
+
 # Database connection string
 DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
 
 # Query to execute
-query = """
+month_filter, month_params = month_predicate(2018, 4)
+query = f"""
 SELECT sectoral_index_id, score_value
 FROM top_1_scores
-WHERE EXTRACT(MONTH FROM trade_date) = 4
-  AND EXTRACT(YEAR FROM trade_date) = 2018
+WHERE {month_filter}
 """
 
 try:
@@ -18,7 +20,7 @@ try:
     print("Connected to database.")
 
     # Execute the query
-    cursor.execute(query)
+    cursor.execute(query, month_params)
 
     # Fetch all rows
     results = cursor.fetchall()
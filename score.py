@@ -1,7 +1,9 @@
 import psycopg2
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional
 
+from monthly_ohlc_refresh import fetch_monthly_rows, refresh_monthly_ohlc
+
 # Constants
 DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
 SECTORAL_INDEX_ID = 4
@@ -10,6 +12,8 @@ BSE500_INDEX_ID = 2
 SCORE_DATE = date(2025, 3, 1)
 
 class Candle:
+    __slots__ = ('trade_date', 'open', 'high', 'low', 'close', 'tag', 'n1', 'n2', 'n3', 'b1', 'b2', 'b3')
+
     def __init__(self, trade_date: date, open_price: float, high: float, low: float, close: float):
         self.trade_date = trade_date
         self.open = open_price
@@ -57,28 +61,9 @@ def fetch_monthly_data(index_id: int, end_date: date) -> Dict[str, 'Candle']:
     try:
         with psycopg2.connect(DEFAULT_DB_URL) as conn:
             with conn.cursor() as cur:
-                sql = """
-                    WITH monthly_data AS (
-                        SELECT EXTRACT(YEAR FROM trade_date) AS year,
-                               EXTRACT(MONTH FROM trade_date) AS month,
-                               trade_date,
-                               FIRST_VALUE(open_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date) ORDER BY trade_date) AS open_price,
-                               MAX(high_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date)) AS high_price,
-                               MIN(low_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date)) AS low_price,
-                               LAST_VALUE(close_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date) ORDER BY trade_date
-                                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS close_price
-                        FROM daily_ohlc
-                        WHERE index_id = %s AND trade_date <= %s
-                    )
-                    SELECT year, month, open_price, high_price, low_price, close_price, trade_date AS last_date
-                    FROM monthly_data
-                    WHERE trade_date = (SELECT MAX(trade_date) FROM monthly_data md2
-                                      WHERE md2.year = monthly_data.year AND md2.month = monthly_data.month)
-                """
-                cur.execute(sql, (index_id, end_date))
-                for row in cur.fetchall():
-                    year, month, open_price, high_price, low_price, close_price, trade_date = row
-                    key = f"{int(year)}-{int(month):02d}"
+                for _, trade_date, open_price, high_price, low_price, close_price in \
+                        fetch_monthly_rows(cur, end_date, index_ids=[index_id]):
+                    key = f"{trade_date.year}-{trade_date.month:02d}"
                     candles[key] = Candle(
                         trade_date,
                         open_price,
@@ -194,6 +179,7 @@ def calculate_scores(n_candles: List['Candle'], b_candles: List['Candle']) -> No
 
 def main():
     try:
+        refresh_monthly_ohlc()
         cutoff = SCORE_DATE.replace(day=1) - timedelta(days=1)  # Last day of Feb
         
         sectoral_data = fetch_monthly_data(SECTORAL_INDEX_ID, cutoff)
@@ -240,5 +226,4 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    from datetime import timedelta
     main()
\ No newline at end of file
@@ -2,6 +2,10 @@ import psycopg2
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional
 
+from monthly_ohlc_refresh import fetch_monthly_rows, refresh_monthly_ohlc
+from stock_monthly_scores import refresh_stock_monthly_scores
+from data_generation import bump_generation, create_generation_table
+
 # Constants
 DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
 SECTORAL_INDEX_ID = 4
@@ -10,6 +14,8 @@ BSE500_INDEX_ID = 2
 SCORE_DATE = date(2025, 3, 1)
 
 class Candle:
+    __slots__ = ('trade_date', 'open', 'high', 'low', 'close', 'tag', 'n1', 'n2', 'n3', 'b1', 'b2', 'b3')
+
     def __init__(self, trade_date: date, open_price: float, high: float, low: float, close: float):
         self.trade_date = trade_date
         self.open = open_price
@@ -115,47 +121,21 @@ def create_tables():
     except psycopg2.Error as e:
         print(f"Error creating tables: {e}")
 
-def fetch_and_store_monthly_data(index_id: int, end_date: date) -> Dict[str, 'Candle']:
+def fetch_monthly_data(index_id: int, end_date: date) -> Dict[str, 'Candle']:
     candles = {}
     try:
         with psycopg2.connect(DEFAULT_DB_URL) as conn:
             with conn.cursor() as cur:
-                sql = """
-                    WITH monthly_data AS (
-                        SELECT EXTRACT(YEAR FROM trade_date) AS year,
-                               EXTRACT(MONTH FROM trade_date) AS month,
-                               trade_date,
-                               FIRST_VALUE(open_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date) ORDER BY trade_date) AS open_price,
-                               MAX(high_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date)) AS high_price,
-                               MIN(low_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date)) AS low_price,
-                               LAST_VALUE(close_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date) ORDER BY trade_date
-                                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS close_price
-                        FROM daily_ohlc
-                        WHERE index_id = %s AND trade_date <= %s
+                for _, trade_date, open_price, high_price, low_price, close_price in \
+                        fetch_monthly_rows(cur, end_date, index_ids=[index_id]):
+                    key = f"{trade_date.year}-{trade_date.month:02d}"
+                    candles[key] = Candle(
+                        trade_date,
+                        open_price,
+                        high_price,
+                        low_price,
+                        close_price
                     )
-                    SELECT year, month, open_price, high_price, low_price, close_price, trade_date AS last_date
-                    FROM monthly_data
-                    WHERE trade_date = (SELECT MAX(trade_date) FROM monthly_data md2
-                                      WHERE md2.year = monthly_data.year AND md2.month = monthly_data.month)
-                """
-                cur.execute(sql, (index_id, end_date))
-                for row in cur.fetchall():
-                    year, month, open_price, high_price, low_price, close_price, trade_date = row
-                    key = f"{int(year)}-{int(month):02d}"
-                    candle = Candle(trade_date, open_price, high_price, low_price, close_price)
-                    candles[key] = candle
-                    
-                    cur.execute("""
-                        INSERT INTO monthly_ohlc (trade_date, index_id, open_price, high_price, low_price, close_price)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (index_id, trade_date) DO UPDATE
-                        SET open_price = EXCLUDED.open_price,
-                            high_price = EXCLUDED.high_price,
-                            low_price = EXCLUDED.low_price,
-                            close_price = EXCLUDED.close_price
-                    """, (trade_date, index_id, open_price, high_price, low_price, close_price))
-                
-                conn.commit()
     except psycopg2.Error as e:
         print(f"Database error: {e}")
     return candles
@@ -220,6 +200,7 @@ def get_and_store_ratio_data(sectoral: Dict[str, 'Candle'], benchmark: Dict[str,
                         """, (candle.trade_date, sectoral_id, benchmark_id,
                               candle.open, candle.high, candle.low, candle.close,
                               candle.tag, candle.b1, candle.b2, candle.b3))
+                bump_generation(cur, table_name)
                 conn.commit()
     except psycopg2.Error as e:
         print(f"Database error: {e}")
@@ -277,12 +258,14 @@ def calculate_scores(n_candles: List['Candle'], b_candles: List['Candle']) -> No
 def main():
     try:
         create_tables()
+        create_generation_table()
         
+        refresh_monthly_ohlc()
         cutoff = SCORE_DATE.replace(day=1) - timedelta(days=1)
         
-        sectoral_data = fetch_and_store_monthly_data(SECTORAL_INDEX_ID, cutoff)
-        nifty_data = fetch_and_store_monthly_data(NIFTY50_INDEX_ID, cutoff)
-        bse500_data = fetch_and_store_monthly_data(BSE500_INDEX_ID, cutoff)
+        sectoral_data = fetch_monthly_data(SECTORAL_INDEX_ID, cutoff)
+        nifty_data = fetch_monthly_data(NIFTY50_INDEX_ID, cutoff)
+        bse500_data = fetch_monthly_data(BSE500_INDEX_ID, cutoff)
 
         print("SECTORAL_INDEX_ID")
         for key, value in sectoral_data.items():
@@ -302,6 +285,8 @@ def main():
                                          SECTORAL_INDEX_ID, NIFTY50_INDEX_ID, 'n_ratios')
         b_ratio = get_and_store_ratio_data(sectoral_data, bse500_data, 
                                          SECTORAL_INDEX_ID, BSE500_INDEX_ID, 'b_ratios')
+        # Every month of this index was rewritten, not only the newest
+        refresh_stock_monthly_scores(full=True)
 
         if not n_ratio or not b_ratio:
             print("No matching months for ratio calculation.")
@@ -1,6 +1,15 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import psycopg2
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+import score_engine
+from bulk_upsert import bulk_upsert
+from monthly_ohlc_refresh import fetch_monthly_rows, refresh_monthly_ohlc
+from stock_monthly_scores import refresh_stock_monthly_scores
+from data_generation import bump_generation, create_generation_table
 
 # Constants
 DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
@@ -8,7 +17,26 @@ NIFTY50_INDEX_ID = 1
 BSE500_INDEX_ID = 2
 SCORE_DATE = date.today()
 
+RATIO_CONFLICT_COLUMNS = ('trade_date', 'sectoral_index_id', 'benchmark_index_id')
+
+# Set in --workers pool processes so each worker reuses one connection
+_worker_conn = None
+_worker_run = None
+
+def get_connection():
+    """The worker's own connection inside a --workers pool, otherwise a new connection."""
+    if _worker_conn is not None:
+        return _worker_conn
+    return psycopg2.connect(DEFAULT_DB_URL)
+
+def ratio_columns(prefix: str) -> tuple:
+    """Column order of n_ratios (prefix 'n') or b_ratios (prefix 'b') rows."""
+    return RATIO_CONFLICT_COLUMNS + ('open_ratio', 'high_ratio', 'low_ratio', 'close_ratio', 'tag',
+                                     f'{prefix}1', f'{prefix}2', f'{prefix}3')
+
 class Candle:
+    __slots__ = ('trade_date', 'open', 'high', 'low', 'close', 'tag', 'n1', 'n2', 'n3', 'b1', 'b2', 'b3')
+
     def __init__(self, trade_date: date, open_price: float, high: float, low: float, close: float):
         self.trade_date = trade_date
         self.open = open_price
@@ -55,6 +83,77 @@ class Candle:
                   f"{candle.b2 if candle.b2 is not None else 'null'},"
                   f"{candle.b3 if candle.b3 is not None else 'null'}")
 
+def _month_key(value) -> int:
+    return value.year * 12 + value.month - 1
+
+class CandleSeries:
+    """
+    Candles of one index or ratio pair as parallel arrays: float64 OHLC rows, int8 tag codes
+    (score_engine values, 0 while untagged) and int16 scores with one row per SCORE_WINDOWS entry.
+    `valid` marks the scores that exist; the first candles of a series have none.
+    """
+    __slots__ = ('trade_dates', 'months', 'ohlc', 'tags', 'scores', 'valid')
+
+    def __init__(self, trade_dates: List[datetime], ohlc, tags=None, scores=None, valid=None):
+        n = len(trade_dates)
+        shape = (len(score_engine.SCORE_WINDOWS), n)
+        self.trade_dates = list(trade_dates)
+        self.months = np.array([_month_key(d) for d in self.trade_dates], dtype=np.int32)
+        self.ohlc = np.asarray(ohlc, dtype=np.float64).reshape(n, 4)
+        self.tags = np.zeros(n, dtype=np.int8) if tags is None else np.asarray(tags, dtype=np.int8)
+        self.scores = np.zeros(shape, dtype=np.int16) if scores is None else np.asarray(scores, dtype=np.int16)
+        self.valid = np.zeros(shape, dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.trade_dates)
+
+    def __getitem__(self, rows: slice) -> 'CandleSeries':
+        return CandleSeries(self.trade_dates[rows], self.ohlc[rows], self.tags[rows],
+                            self.scores[:, rows], self.valid[:, rows])
+
+    def since(self, month_start: date) -> 'CandleSeries':
+        """Candles from the month of month_start onwards."""
+        return self[int(np.searchsorted(self.months, _month_key(month_start))):]
+
+    @classmethod
+    def from_candles(cls, candles: List['Candle'], prefix: Optional[str] = None) -> 'CandleSeries':
+        """Series from Candle objects; with prefix 'n' or 'b' their tags and scores are copied too."""
+        series = cls([c.trade_date for c in candles], [[c.open, c.high, c.low, c.close] for c in candles])
+        if prefix:
+            series.tags[:] = [score_engine.TAG_CODES.get(c.tag, 0) for c in candles]
+            for w, window in enumerate(score_engine.SCORE_WINDOWS):
+                values = [getattr(c, f"{prefix}{window}") for c in candles]
+                series.valid[w] = [v is not None for v in values]
+                series.scores[w] = [v or 0 for v in values]
+        return series
+
+    def to_candles(self, prefix: str) -> List['Candle']:
+        candles = []
+        for i, (trade_date, (o, h, l, c)) in enumerate(zip(self.trade_dates, self.ohlc.tolist())):
+            candle = Candle(trade_date, o, h, l, c)
+            candle.tag = score_engine.TAG_NAMES.get(int(self.tags[i]))
+            for w, window in enumerate(score_engine.SCORE_WINDOWS):
+                if self.valid[w, i]:
+                    setattr(candle, f"{prefix}{window}", int(self.scores[w, i]))
+            candles.append(candle)
+        return candles
+
+    def ratio_rows(self, sectoral_id: int, benchmark_id: int) -> List[tuple]:
+        """n_ratios/b_ratios rows in ratio_columns order."""
+        scores = [[s if ok else None for s, ok in zip(row, valid)]
+                  for row, valid in zip(self.scores.tolist(), self.valid.tolist())]
+        return [(trade_date, sectoral_id, benchmark_id, *ohlc, score_engine.TAG_NAMES[tag], *window_scores)
+                for trade_date, ohlc, tag, window_scores
+                in zip(self.trade_dates, self.ohlc.tolist(), self.tags.tolist(), zip(*scores))]
+
+    @staticmethod
+    def concat(first: 'CandleSeries', second: 'CandleSeries') -> 'CandleSeries':
+        return CandleSeries(first.trade_dates + second.trade_dates,
+                            np.concatenate((first.ohlc, second.ohlc)),
+                            np.concatenate((first.tags, second.tags)),
+                            np.concatenate((first.scores, second.scores), axis=1),
+                            np.concatenate((first.valid, second.valid), axis=1))
+
 def create_tables():
     try:
         with psycopg2.connect(DEFAULT_DB_URL) as conn:
@@ -114,170 +213,87 @@ def create_tables():
     except psycopg2.Error as e:
         print(f"Error creating tables: {e}")
 
-def fetch_and_store_monthly_data(index_id: int, end_date: date) -> Dict[str, 'Candle']:
-    candles = {}
-    try:
-        with psycopg2.connect(DEFAULT_DB_URL) as conn:
-            with conn.cursor() as cur:
-                sql = """
-                    WITH monthly_data AS (
-                        SELECT EXTRACT(YEAR FROM trade_date) AS year,
-                               EXTRACT(MONTH FROM trade_date) AS month,
-                               trade_date,
-                               FIRST_VALUE(open_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date) ORDER BY trade_date) AS open_price,
-                               MAX(high_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date)) AS high_price,
-                               MIN(low_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date)) AS low_price,
-                               LAST_VALUE(close_price) OVER (PARTITION BY EXTRACT(YEAR FROM trade_date), EXTRACT(MONTH FROM trade_date) ORDER BY trade_date
-                                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS close_price
-                        FROM daily_ohlc
-                        WHERE index_id = %s AND trade_date <= %s
-                    )
-                    SELECT year, month, open_price, high_price, low_price, close_price, trade_date AS last_date
-                    FROM monthly_data
-                    WHERE trade_date = (SELECT MAX(trade_date) FROM monthly_data md2
-                                      WHERE md2.year = monthly_data.year AND md2.month = monthly_data.month)
-                """
-                cur.execute(sql, (index_id, end_date))
-                for row in cur.fetchall():
-                    year, month, open_price, high_price, low_price, close_price, trade_date = row
-                    key = f"{int(year)}-{int(month):02d}"
-                    candle = Candle(trade_date, open_price, high_price, low_price, close_price)
-                    candles[key] = candle
-                    
-                    cur.execute("""
-                        INSERT INTO monthly_ohlc (trade_date, index_id, open_price, high_price, low_price, close_price)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (index_id, trade_date) DO UPDATE
-                        SET open_price = EXCLUDED.open_price,
-                            high_price = EXCLUDED.high_price,
-                            low_price = EXCLUDED.low_price,
-                            close_price = EXCLUDED.close_price
-                    """, (trade_date, index_id, open_price, high_price, low_price, close_price))
-                
-                conn.commit()
-    except psycopg2.Error as e:
-        print(f"Database error: {e}")
-    return candles
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+def _month_after(value) -> date:
+    """First day of the month following the given date."""
+    d = _as_date(value)
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
 
-def get_and_store_ratio_data(sectoral: Dict[str, 'Candle'], benchmark: Dict[str, 'Candle'], 
-                           sectoral_id: int, benchmark_id: int, table_name: str) -> List['Candle']:
-    ratio_candles = []
+def fetch_monthly_data(end_date: date, start_date: Optional[date] = None,
+                       index_ids: Optional[List[int]] = None) -> Dict[int, CandleSeries]:
+    """
+    Monthly candles from monthly_ohlc for every index (or just index_ids) up to end_date,
+    from the month of start_date if given, as one CandleSeries per index in month order.
+    """
+    rows_by_index = {}
     try:
-        with psycopg2.connect(DEFAULT_DB_URL) as conn:
+        with get_connection() as conn:
             with conn.cursor() as cur:
-                # Generate all ratio candles
-                for month in sectoral:
-                    if month in benchmark:
-                        s = sectoral[month]
-                        b = benchmark[month]
-                        candle = Candle(
-                            s.trade_date,
-                            s.open / b.open,
-                            s.high / b.high,
-                            s.low / b.low,
-                            s.close / b.close
-                        )
-                        ratio_candles.append(candle)
-                
-                # Calculate tags and scores for all candles
-                tag_candles(ratio_candles)
-                temp_list = ratio_candles.copy()
-                calculate_scores(ratio_candles, temp_list) if table_name == 'n_ratios' else calculate_scores(temp_list, ratio_candles)
-                
-                # Insert ALL candles into the appropriate table
-                for candle in ratio_candles:
-                    if table_name == 'n_ratios':
-                        cur.execute("""
-                            INSERT INTO n_ratios (trade_date, sectoral_index_id, benchmark_index_id, 
-                                               open_ratio, high_ratio, low_ratio, close_ratio,
-                                               tag, n1, n2, n3)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (trade_date, sectoral_index_id, benchmark_index_id) DO UPDATE
-                            SET open_ratio = EXCLUDED.open_ratio,
-                                high_ratio = EXCLUDED.high_ratio,
-                                low_ratio = EXCLUDED.low_ratio,
-                                close_ratio = EXCLUDED.close_ratio,
-                                tag = EXCLUDED.tag,
-                                n1 = EXCLUDED.n1,
-                                n2 = EXCLUDED.n2,
-                                n3 = EXCLUDED.n3
-                        """, (candle.trade_date, sectoral_id, benchmark_id,
-                              candle.open, candle.high, candle.low, candle.close,
-                              candle.tag, candle.n1, candle.n2, candle.n3))
-                    else:  # b_ratios
-                        cur.execute("""
-                            INSERT INTO b_ratios (trade_date, sectoral_index_id, benchmark_index_id, 
-                                               open_ratio, high_ratio, low_ratio, close_ratio,
-                                               tag, b1, b2, b3)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (trade_date, sectoral_index_id, benchmark_index_id) DO UPDATE
-                            SET open_ratio = EXCLUDED.open_ratio,
-                                high_ratio = EXCLUDED.high_ratio,
-                                low_ratio = EXCLUDED.low_ratio,
-                                close_ratio = EXCLUDED.close_ratio,
-                                tag = EXCLUDED.tag,
-                                b1 = EXCLUDED.b1,
-                                b2 = EXCLUDED.b2,
-                                b3 = EXCLUDED.b3
-                        """, (candle.trade_date, sectoral_id, benchmark_id,
-                              candle.open, candle.high, candle.low, candle.close,
-                              candle.tag, candle.b1, candle.b2, candle.b3))
-                conn.commit()
-                print(f"Inserted {len(ratio_candles)} rows into {table_name}")
+                for row in fetch_monthly_rows(cur, end_date, start_date, index_ids):
+                    rows_by_index.setdefault(row[0], []).append(row)
     except psycopg2.Error as e:
         print(f"Database error: {e}")
-    return ratio_candles
-
-def tag_candles(candles: List['Candle']) -> None:
-    prev_tag = "Bullish"
-    for i, curr in enumerate(candles):
-        if i == 0:
-            curr.tag = "Bullish"
-        else:
-            prev = candles[i - 1]
-            prev_close = prev.close
-            prev_open = prev.open
-            curr_close = curr.close
-
-            if curr_close > prev_close:
-                if prev_tag in ["Highly Bullish", "Bullish"]:
-                    curr.tag = "Highly Bullish" if prev_close >= prev_open else \
-                              "Highly Bullish" if curr_close > prev_open else "Bullish"
-                else:
-                    curr.tag = "Bullish" if prev_close > prev_open else \
-                              "Bullish" if curr_close > prev_open else "Bearish"
-            elif curr_close < prev_close:
-                if prev_tag in ["Highly Bullish", "Bullish"]:
-                    curr.tag = "Bullish" if prev_close >= prev_open and curr_close > prev_open else "Bearish"
-                else:
-                    curr.tag = "Highly Bearish" if prev_close <= prev_open else \
-                              "Bearish" if curr_close > prev_open else "Highly Bearish"
-            else:
-                if prev_tag in ["Highly Bullish", "Bullish"]:
-                    curr.tag = prev_tag if prev_close >= prev_open else "Bullish"
-                else:
-                    curr.tag = "Bearish" if prev_close < prev_open else prev_tag
-        prev_tag = curr.tag
+    return {index_id: CandleSeries([r[1] for r in rows], [r[2:] for r in rows])
+            for index_id, rows in rows_by_index.items()}
 
-def calculate_scores(n_candles: List['Candle'], b_candles: List['Candle']) -> None:
-    def score_for_tag(tag: str) -> int:
-        return {"Highly Bullish": 2, "Bullish": 1, "Bearish": -1, "Highly Bearish": -2}.get(tag, 0)
+def score_ratio_pairs(pairs: List[Tuple[int, int, CandleSeries, CandleSeries]],
+                      history: Dict[Tuple[int, int], CandleSeries]) -> Dict[Tuple[int, int], CandleSeries]:
+    """
+    Ratio candles of every (sectoral_id, benchmark_id, sectoral, benchmark) pair for the months
+    both series have, keyed by (sectoral_id, benchmark_id). All pairs are divided, tagged and
+    scored as one stacked array with score_engine; a pair's stored candles in `history` are
+    stacked ahead of it so their tags are kept and count towards its first windows, and only
+    later months are returned. Ratios are rounded to the 8 places of DECIMAL(15, 8), so they
+    compare exactly as the stored ratios read back as history do.
+    """
+    if not pairs:
+        return {}
+    keys, trade_dates, histories, sectoral_ohlc, benchmark_ohlc = [], [], [], [], []
+    for sectoral_id, benchmark_id, sectoral, benchmark in pairs:
+        _, s_rows, b_rows = np.intersect1d(sectoral.months, benchmark.months, assume_unique=True,
+                                           return_indices=True)
+        pair_history = history.get((sectoral_id, benchmark_id)) or CandleSeries([], [])
+        if len(pair_history):
+            new = sectoral.months[s_rows] > pair_history.months[-1]
+            s_rows, b_rows = s_rows[new], b_rows[new]
+        keys.append((sectoral_id, benchmark_id))
+        trade_dates.append([sectoral.trade_dates[i] for i in s_rows.tolist()])
+        histories.append(pair_history)
+        sectoral_ohlc.append(sectoral.ohlc[s_rows])
+        benchmark_ohlc.append(benchmark.ohlc[b_rows])
 
-    n_scores = [score_for_tag(candle.tag) for candle in n_candles]
-    b_scores = [score_for_tag(candle.tag) for candle in b_candles]
+    new_sectoral, new_starts = score_engine.concat_series(sectoral_ohlc)
+    new_benchmark, _ = score_engine.concat_series(benchmark_ohlc)
+    ratios = np.split(np.round(score_engine.ratio_ohlc(new_sectoral, new_benchmark), 8), new_starts[1:])
 
-    for i in range(len(n_candles)):
-        if i >= 1:
-            n_candles[i].n1 = n_scores[i - 1]
-            b_candles[i].b1 = b_scores[i - 1]
-        if i >= 2:
-            n_candles[i].n2 = n_scores[i - 2] + n_scores[i - 1]
-            b_candles[i].b2 = b_scores[i - 2] + b_scores[i - 1]
-        if i >= 3:
-            n_candles[i].n3 = n_scores[i - 3] + n_scores[i - 2] + n_scores[i - 1]
-            b_candles[i].b3 = b_scores[i - 3] + b_scores[i - 2] + b_scores[i - 1]
+    ohlc, starts = score_engine.concat_series([np.concatenate((h.ohlc, r)) for h, r in zip(histories, ratios)])
+    fixed = np.concatenate([np.concatenate((h.tags, np.zeros(len(r), dtype=np.int8)))
+                            for h, r in zip(histories, ratios)])
+    tags, scores, valid = score_engine.score_series(ohlc, starts, fixed)
 
+    scored = {}
+    for key, dates, pair_history, start in zip(keys, trade_dates, histories, starts.tolist()):
+        rows = slice(start + len(pair_history), start + len(pair_history) + len(dates))
+        scored[key] = CandleSeries(dates, ohlc[rows], tags[rows], scores[:, rows], valid[:, rows])
+    return scored
 
+def store_ratio_series(ratio_series: CandleSeries, sectoral_id: int, benchmark_id: int,
+                       table_name: str) -> CandleSeries:
+    """Upsert a pair's scored ratio candles into n_ratios or b_ratios in one batch."""
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                prefix = 'n' if table_name == 'n_ratios' else 'b'
+                bulk_upsert(cur, table_name, ratio_columns(prefix), RATIO_CONFLICT_COLUMNS,
+                            ratio_series.ratio_rows(sectoral_id, benchmark_id))
+                bump_generation(cur, table_name)
+                conn.commit()
+                print(f"Inserted {len(ratio_series)} rows into {table_name}")
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+    return ratio_series
 
 def fetch_indices():
     try:
@@ -292,16 +308,103 @@ def fetch_indices():
         print("Error:", e)
         return []
 
-def process_sectoral_data(sectoral_id):
+def fetch_last_ratio_candles(table_name: str, limit: int = 3) -> Dict[Tuple[int, int], CandleSeries]:
+    """Last `limit` stored ratio candles per (sectoral, benchmark) pair, oldest first, with tags and scores."""
+    prefix = 'n' if table_name == 'n_ratios' else 'b'
+    rows_by_pair = {}
     try:
+        with psycopg2.connect(DEFAULT_DB_URL) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT trade_date, sectoral_index_id, benchmark_index_id,
+                           open_ratio, high_ratio, low_ratio, close_ratio, tag,
+                           {prefix}1, {prefix}2, {prefix}3
+                    FROM (
+                        SELECT *, ROW_NUMBER() OVER (PARTITION BY sectoral_index_id, benchmark_index_id
+                                                     ORDER BY trade_date DESC) AS rn
+                        FROM {table_name}
+                    ) r
+                    WHERE rn <= %s
+                    ORDER BY sectoral_index_id, benchmark_index_id, trade_date
+                """, (limit,))
+                for row in cur.fetchall():
+                    rows_by_pair.setdefault((row[1], row[2]), []).append(row)
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+    history = {}
+    for pair, rows in rows_by_pair.items():
+        series = CandleSeries([r[0] for r in rows], [r[3:7] for r in rows],
+                              [score_engine.TAG_CODES.get(r[7], 0) for r in rows])
+        for w in range(len(score_engine.SCORE_WINDOWS)):
+            values = [r[8 + w] for r in rows]
+            series.valid[w] = [v is not None for v in values]
+            series.scores[w] = [v or 0 for v in values]
+        history[pair] = series
+    return history
+
+class ScoringRun:
+    """
+    Data shared by every sectoral index in one run: the index list and every index's monthly candles.
+    Unless full is set, the last stored ratio candles are loaded too and only later months are rescored.
+    """
+    def __init__(self, score_date: date = SCORE_DATE, full: bool = False):
+        self.score_date = score_date
+        self.cutoff = score_date.replace(day=1) - timedelta(days=1)
+        self.full = full
+        self.index_ids = fetch_indices()
+        self.history = {}
+        if not full:
+            self.history.update(fetch_last_ratio_candles('n_ratios'))
+            self.history.update(fetch_last_ratio_candles('b_ratios'))
+        # One read covers the benchmarks and every sectoral index
+        self.monthly = fetch_monthly_data(self.cutoff, self.benchmark_start())
+        self.nifty_data = self.monthly.get(NIFTY50_INDEX_ID, CandleSeries([], []))
+        self.bse500_data = self.monthly.get(BSE500_INDEX_ID, CandleSeries([], []))
+        # Scored ratio candles per (sectoral, benchmark) pair, filled in by score()
+        self.ratios: Dict[Tuple[int, int], CandleSeries] = {}
+
+    def sectoral_data(self, sectoral_id: int) -> CandleSeries:
+        """The index's candles from the first month it still needs scored."""
+        start = self.sectoral_start(sectoral_id)
+        series = self.monthly.get(sectoral_id, CandleSeries([], []))
+        return series.since(start) if start is not None else series
+
+    def score(self, sectoral_ids: List[int]) -> None:
+        """Ratio candles against both benchmarks for every index not yet scored, in one stacked pass."""
+        pairs = []
+        for sectoral_id in sectoral_ids:
+            if (sectoral_id, NIFTY50_INDEX_ID) in self.ratios:
+                continue
+            sectoral = self.sectoral_data(sectoral_id)
+            pairs.append((sectoral_id, NIFTY50_INDEX_ID, sectoral, self.nifty_data))
+            pairs.append((sectoral_id, BSE500_INDEX_ID, sectoral, self.bse500_data))
+        self.ratios.update(score_ratio_pairs(pairs, self.history))
+
+    def sectoral_start(self, sectoral_id: int) -> Optional[date]:
+        """First month this index still needs scored, or None to score its whole history."""
+        pairs = [(sectoral_id, NIFTY50_INDEX_ID), (sectoral_id, BSE500_INDEX_ID)]
+        if self.full or any(pair not in self.history for pair in pairs):
+            return None
+        return min(_month_after(self.history[pair].trade_dates[-1]) for pair in pairs)
+
+    def benchmark_start(self) -> Optional[date]:
+        starts = [self.sectoral_start(i) for i in self.index_ids
+                  if i not in (NIFTY50_INDEX_ID, BSE500_INDEX_ID)]
+        if not starts or None in starts:
+            return None
+        return min(starts)
+
+def process_sectoral_data(sectoral_id, run: Optional[ScoringRun] = None, verbose: bool = True) -> Optional[Dict]:
+    """Score one sectoral index; returns its latest n/b scores and row counts, or None if nothing was scored."""
+    try:
+        if run is None:
+            run = ScoringRun()
+        cutoff = run.cutoff
         
-        cutoff = SCORE_DATE.replace(day=1) - timedelta(days=1)
-        
-        index_ids = fetch_indices()
-        print(index_ids)
-        sectoral_data = fetch_and_store_monthly_data(sectoral_id, cutoff)
-        nifty_data = fetch_and_store_monthly_data(NIFTY50_INDEX_ID, cutoff)
-        bse500_data = fetch_and_store_monthly_data(BSE500_INDEX_ID, cutoff)
+        start = run.sectoral_start(sectoral_id)
+        sectoral_data = run.sectoral_data(sectoral_id)
+        nifty_data = run.nifty_data
+        bse500_data = run.bse500_data
 
         # print(f"{sectoral_id}")
         # for key, value in sectoral_data.items():
@@ -313,48 +416,102 @@ def process_sectoral_data(sectoral_id):
         # for key, value in bse500_data.items():
         #     print(f"{key} -> {value}")
 
-        if not all([sectoral_data, nifty_data, bse500_data]):
-            print("Insufficient data for calculation.")
+        if not all([len(sectoral_data), len(nifty_data), len(bse500_data)]):
+            if start:
+                print(f"No new months since {start}.")
+            else:
+                print("Insufficient data for calculation.")
             return
 
-        n_ratio = get_and_store_ratio_data(sectoral_data, nifty_data, 
-                                         sectoral_id, NIFTY50_INDEX_ID, 'n_ratios')
-        b_ratio = get_and_store_ratio_data(sectoral_data, bse500_data, 
-                                         sectoral_id, BSE500_INDEX_ID, 'b_ratios')
+        # A no-op when main() has already scored every index of the run
+        run.score([sectoral_id])
+        n_ratio = store_ratio_series(run.ratios[(sectoral_id, NIFTY50_INDEX_ID)],
+                                     sectoral_id, NIFTY50_INDEX_ID, 'n_ratios')
+        b_ratio = store_ratio_series(run.ratios[(sectoral_id, BSE500_INDEX_ID)],
+                                     sectoral_id, BSE500_INDEX_ID, 'b_ratios')
 
-        if not n_ratio or not b_ratio:
-            print("No matching months for ratio calculation.")
+        if not len(n_ratio) or not len(b_ratio):
+            print("No new matching months for ratio calculation.")
             return
 
-        print(f"Scores for {SCORE_DATE} (based on data up to {cutoff}):")
-        last_n = n_ratio[-1]
-        last_b = b_ratio[-1]
-        print(f"N Scores: n1={last_n.n1}, n2={last_n.n2}, n3={last_n.n3}")
-        print(f"B Scores: b1={last_b.b1}, b2={last_b.b2}, b3={last_b.b3}")
+        last_n = n_ratio[-1:].to_candles('n')[0]
+        last_b = b_ratio[-1:].to_candles('b')[0]
+        if verbose:
+            print(f"Scores for {run.score_date} (based on data up to {cutoff}):")
+            print(f"N Scores: n1={last_n.n1}, n2={last_n.n2}, n3={last_n.n3}")
+            print(f"B Scores: b1={last_b.b1}, b2={last_b.b2}, b3={last_b.b3}")
+
+            Candle.print_n_ratios(n_ratio.to_candles('n'))
+            Candle.print_b_ratios(b_ratio.to_candles('b'))
 
-        Candle.print_n_ratios(n_ratio)
-        Candle.print_b_ratios(b_ratio)
+        return {
+            'sectoral_id': sectoral_id,
+            'trade_date': _as_date(last_n.trade_date),
+            'n_rows': len(n_ratio), 'b_rows': len(b_ratio),
+            'n1': last_n.n1, 'n2': last_n.n2, 'n3': last_n.n3,
+            'b1': last_b.b1, 'b2': last_b.b2, 'b3': last_b.b3,
+        }
 
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
 
+def _init_worker(run: ScoringRun):
+    global _worker_conn, _worker_run
+    _worker_conn = psycopg2.connect(DEFAULT_DB_URL)
+    _worker_run = run
+
+def _score_in_worker(sectoral_id: int) -> Optional[Dict]:
+    print(f"Processing sectoral ID: {sectoral_id}")
+    return process_sectoral_data(sectoral_id, _worker_run, verbose=False)
+
+def print_summary(results: List[Optional[Dict]]) -> None:
+    print("\n--------Run Summary------------")
+    print("sectoral_id,trade_date,n_rows,b_rows,n1,n2,n3,b1,b2,b3")
+    for r in results:
+        if r is None:
+            continue
+        print(",".join("null" if r[k] is None else str(r[k]) for k in
+                       ('sectoral_id', 'trade_date', 'n_rows', 'b_rows', 'n1', 'n2', 'n3', 'b1', 'b2', 'b3')))
+
 # Call process_sectoral_data for all indices
-def main():
+def main(full: bool = False, workers: int = 1):
 
     # create_tables()
-    index_ids = fetch_indices()
+    create_generation_table()
+    refresh_monthly_ohlc(full=full)
+    run = ScoringRun(full=full)
+    index_ids = run.index_ids
     if not index_ids:
         print("No indices found to process.")
         return
-    
-    for sectoral_id in index_ids:
-        if sectoral_id == NIFTY50_INDEX_ID or sectoral_id == BSE500_INDEX_ID:
-            continue
-        print(f"\nProcessing sectoral ID: {sectoral_id}")
-        print("-" * 50)
-        process_sectoral_data(sectoral_id)
+    print(index_ids)
+    sectoral_ids = [i for i in index_ids if i != NIFTY50_INDEX_ID and i != BSE500_INDEX_ID]
+    # Every pair of the run is tagged and scored at once; the per-index steps below only write
+    run.score(sectoral_ids)
+
+    if workers > 1:
+        # Each worker opens one connection and receives the run (benchmarks included) once
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(run,)) as pool:
+            results = list(pool.map(_score_in_worker, sectoral_ids))
+    else:
+        results = []
+        for sectoral_id in sectoral_ids:
+            print(f"\nProcessing sectoral ID: {sectoral_id}")
+            print("-" * 50)
+            results.append(process_sectoral_data(sectoral_id, run))
+
+    print_summary(results)
+    # From the first month written, so a new index's back-filled history is materialized too
+    first_dates = [_as_date(series.trade_dates[0]) for series in run.ratios.values() if len(series)]
+    refresh_stock_monthly_scores(full=full, from_month=min(first_dates, default=None))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Score sectoral indices against NIFTY 50 and BSE 500.")
+    parser.add_argument('--full', action='store_true',
+                        help="rescore every month instead of only months after the last stored ones")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes scoring sectoral indices in parallel")
+    args = parser.parse_args()
+    main(full=args.full, workers=args.workers)
\ No newline at end of file
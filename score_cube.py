@@ -0,0 +1,176 @@
+import threading
+import time
+from datetime import date
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from data_generation import fetch_generations
+
+# In-memory copy of n_ratios/b_ratios and stock_index_mapping for the API. Scores live in one
+# dense float array indexed [month, index, subtype] (NaN where there is no score), which ratio
+# rows exist in a bool array indexed [month, index, table] (n_ratios, b_ratios) so a row whose
+# scores are all NULL still counts, and each stock's indices in a CSR-style adjacency
+# (stock_indptr/stock_indices). ScoreCubeStore loads
+# it in the background and swaps in a new cube whenever the data generations move.
+SUBTYPES = ('n1', 'n2', 'n3', 'b1', 'b2', 'b3')
+SUBTYPE_POSITIONS = {subtype: position for position, subtype in enumerate(SUBTYPES)}
+
+def _month_array(dates: Sequence[date]) -> np.ndarray:
+    return np.array(dates, dtype='datetime64[D]').astype('datetime64[M]')
+
+class ScoreCube:
+    def __init__(self, months: np.ndarray, index_ids: np.ndarray, scores: np.ndarray, rated: np.ndarray,
+                 stocks: List[str], stock_indptr: np.ndarray, stock_indices: np.ndarray,
+                 generations: Tuple[Tuple[str, int], ...]):
+        self.months = months
+        self.index_ids = index_ids
+        self.scores = scores
+        self.rated = rated
+        self.stocks = stocks
+        self.stock_positions = {stock: position for position, stock in enumerate(stocks)}
+        self.stock_indptr = stock_indptr
+        self.stock_indices = stock_indices
+        self.generations = generations
+
+    @classmethod
+    def load(cls, cur) -> 'ScoreCube':
+        """
+        Read both ratio tables, the mapping and the data generations through `cur` in one
+        snapshot. Where a (month, index) has several rows, the last by trade_date and benchmark
+        wins, as in the handlers' per-month dicts.
+        """
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        generations = fetch_generations(cur)
+        ratio_rows = {}
+        for table, columns in (('n_ratios', SUBTYPES[:3]), ('b_ratios', SUBTYPES[3:])):
+            cur.execute(f"""
+                SELECT trade_date::date, sectoral_index_id, {', '.join(columns)}
+                FROM {table}
+                ORDER BY trade_date, benchmark_index_id
+            """)
+            ratio_rows[table] = cur.fetchall()
+        cur.execute("SELECT stock_symbol, index_id FROM stock_index_mapping ORDER BY stock_symbol, index_id")
+        mapping = cur.fetchall()
+
+        all_rows = ratio_rows['n_ratios'] + ratio_rows['b_ratios']
+        months = np.unique(_month_array([row[0] for row in all_rows]))
+        index_ids = np.unique(np.array([row[1] for row in all_rows] + [row[1] for row in mapping], dtype=np.int64))
+        scores = np.full((len(months), len(index_ids), len(SUBTYPES)), np.nan)
+        rated = np.zeros((len(months), len(index_ids), 2), dtype=bool)
+        for table, (offset, rows) in enumerate(((0, ratio_rows['n_ratios']), (3, ratio_rows['b_ratios']))):
+            if not rows:
+                continue
+            month_pos = np.searchsorted(months, _month_array([row[0] for row in rows]))
+            index_pos = np.searchsorted(index_ids, np.array([row[1] for row in rows], dtype=np.int64))
+            scores[month_pos, index_pos, offset:offset + 3] = np.array([row[2:] for row in rows], dtype=float)
+            rated[month_pos, index_pos, table] = True
+
+        stocks = sorted({row[0] for row in mapping})
+        counts = np.bincount(np.searchsorted(stocks, [row[0] for row in mapping]), minlength=len(stocks))
+        stock_indptr = np.concatenate(([0], np.cumsum(counts)))
+        stock_indices = np.searchsorted(index_ids, np.array([row[1] for row in mapping], dtype=np.int64))
+        return cls(months, index_ids, scores, rated, stocks, stock_indptr, stock_indices, generations)
+
+    def month_position(self, year: int, month: int) -> Optional[int]:
+        position = int(np.searchsorted(self.months, np.datetime64(f"{year:04d}-{month:02d}", 'M')))
+        if position < len(self.months) and self.months[position] == np.datetime64(f"{year:04d}-{month:02d}", 'M'):
+            return position
+        return None
+
+    def stock_index_positions(self, stock: str) -> np.ndarray:
+        position = self.stock_positions.get(stock)
+        if position is None:
+            return self.stock_indices[:0]
+        return self.stock_indices[self.stock_indptr[position]:self.stock_indptr[position + 1]]
+
+    def stock_month_rows(self, stock: str, year: int, month: int,
+                         subtypes: Sequence[str] = SUBTYPES) -> List[tuple]:
+        """
+        (month_start, index_id, *scores) for each of the stock's indices with any of `subtypes`
+        scored that month, missing scores as None, like the rows of the handlers' queries.
+        """
+        month_pos = self.month_position(year, month)
+        if month_pos is None:
+            return []
+        index_pos = self.stock_index_positions(stock)
+        values = self.scores[month_pos][index_pos][:, [SUBTYPE_POSITIONS[s] for s in subtypes]]
+        month_start = date(year, month, 1)
+        return [(month_start, int(self.index_ids[i]), *(None if np.isnan(v) else int(v) for v in row))
+                for i, row in zip(index_pos, values) if not np.isnan(row).all()]
+
+    def stock_month_extremes(self, stock: str, year: int, month: int) -> Optional[tuple]:
+        """
+        (max, min) of every subtype across the stock's indices that month, flattened in SUBTYPES
+        order with None where nothing is scored; None when none of the stock's indices has a
+        ratio row that month. A row whose scores are all NULL still counts, as in the SQL path.
+        """
+        month_pos = self.month_position(year, month)
+        if month_pos is None:
+            return None
+        index_pos = self.stock_index_positions(stock)
+        present = self.rated[month_pos][index_pos].any(axis=1)
+        if not present.any():
+            return None
+        extremes = []
+        for column in self.scores[month_pos][index_pos][present].T:
+            scores = column[~np.isnan(column)]
+            extremes += [int(scores.max()), int(scores.min())] if len(scores) else [None, None]
+        return tuple(extremes)
+
+    def month_stock_scores(self, year: int, month: int, subtype: str,
+                           stocks: Optional[Sequence[str]] = None) -> List[Tuple[str, int]]:
+        """(stock, score) for every scored index of every stock (or of `stocks`) that month."""
+        month_pos = self.month_position(year, month)
+        if month_pos is None:
+            return []
+        values = self.scores[month_pos, :, SUBTYPE_POSITIONS[subtype]]
+        rows = []
+        for stock in (self.stocks if not stocks else dict.fromkeys(stocks)):
+            for v in values[self.stock_index_positions(stock)]:
+                if not np.isnan(v):
+                    rows.append((stock, int(v)))
+        return rows
+
+class ScoreCubeStore:
+    """
+    The current ScoreCube, loaded through `connection` (a callable returning a connection context
+    manager) on a background thread. get() only returns a cube built at the given generations,
+    so a response is never assembled from data older than its ETag and cache key claim. A
+    failed load is retried after `retry_seconds`.
+    """
+    def __init__(self, connection: Callable, retry_seconds: float = 30.0):
+        self.connection = connection
+        self.retry_seconds = retry_seconds
+        self._cube: Optional[ScoreCube] = None
+        self._loading = False
+        self._failed_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def get(self, generations: Tuple[Tuple[str, int], ...]) -> Optional[ScoreCube]:
+        if not generations:
+            return None
+        cube = self._cube
+        if cube is not None and cube.generations == generations:
+            return cube
+        with self._lock:
+            if self._loading or time.monotonic() - self._failed_at < self.retry_seconds:
+                return None
+            self._loading = True
+        threading.Thread(target=self._load, name='score-cube-load', daemon=True).start()
+        return None
+
+    def _load(self) -> None:
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cube = ScoreCube.load(cur)
+            self._cube = cube
+            print(f"Loaded score cube: {len(cube.months)} months x {len(cube.index_ids)} indices, "
+                  f"{len(cube.stocks)} stocks")
+        except Exception as e:
+            # Runs on its own thread: report and retry later rather than let the thread die
+            self._failed_at = time.monotonic()
+            print(f"Error loading score cube: {e}")
+        finally:
+            with self._lock:
+                self._loading = False
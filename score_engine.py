@@ -0,0 +1,146 @@
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+# Tags are stored as small ints whose value is also the tag's score
+HIGHLY_BEARISH = -2
+BEARISH = -1
+BULLISH = 1
+HIGHLY_BULLISH = 2
+
+TAG_NAMES = {
+    HIGHLY_BULLISH: "Highly Bullish",
+    BULLISH: "Bullish",
+    BEARISH: "Bearish",
+    HIGHLY_BEARISH: "Highly Bearish",
+}
+TAG_CODES = {name: code for code, name in TAG_NAMES.items()}
+
+SCORE_WINDOWS = (1, 2, 3)
+
+OPEN, HIGH, LOW, CLOSE = 0, 1, 2, 3
+
+
+def concat_series(series: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack per-index (n, 4) OHLC arrays end to end and return them with each series' start offset."""
+    lengths = np.array([len(s) for s in series], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+    if len(series) == 0:
+        return np.empty((0, 4), dtype=np.float64), starts
+    return np.concatenate([np.asarray(s, dtype=np.float64).reshape(-1, 4) for s in series]), starts
+
+
+def ratio_ohlc(sectoral: np.ndarray, benchmark: np.ndarray) -> np.ndarray:
+    """Element-wise sectoral / benchmark OHLC ratio candles."""
+    return np.asarray(sectoral, dtype=np.float64) / np.asarray(benchmark, dtype=np.float64)
+
+
+def _segment_positions(n: int, starts: np.ndarray) -> np.ndarray:
+    """Position of every row inside its own series (0 for the first candle of each index)."""
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.diff(np.append(starts, n))
+    return np.arange(n, dtype=np.int64) - np.repeat(starts, lengths)
+
+
+def _forward_fill(values: np.ndarray, known: np.ndarray) -> np.ndarray:
+    """Replace every unknown entry with the last known entry before it."""
+    idx = np.where(known, np.arange(len(values)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    return values[idx]
+
+
+def tag_codes(open_: np.ndarray, close: np.ndarray, starts: np.ndarray,
+              fixed: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Array version of tag_candles over many series at once.
+
+    The first candle of each series is Bullish unless `fixed` gives it a tag; any
+    non-zero entry of `fixed` is taken as the known tag for that row.
+    Returns an int8 array of tag codes.
+    """
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    tags = np.zeros(n, dtype=np.int8)
+    if n == 0:
+        return tags
+
+    first = np.zeros(n, dtype=bool)
+    starts = np.asarray(starts, dtype=np.int64)
+    first[starts[starts < n]] = True
+    if fixed is None:
+        fixed = np.zeros(n, dtype=np.int8)
+    fixed = np.where(first & (fixed == 0), BULLISH, fixed).astype(np.int8)
+    is_fixed = fixed != 0
+
+    prev_open = np.roll(open_, 1)
+    prev_close = np.roll(close, 1)
+    up = close > prev_close
+    down = close < prev_close
+    flat = ~(up | down)
+    prev_green = prev_close > prev_open
+    prev_green_or_doji = prev_close >= prev_open
+    above_prev_open = close > prev_open
+
+    # Bullish/bearish class of each tag. It only changes on candles that settle it
+    # regardless of the previous class; everywhere else it carries forward.
+    sets_bull = up & (prev_green | above_prev_open)
+    sets_bear = down & ~(prev_green_or_doji & above_prev_open)
+    known_class = is_fixed | sets_bull | sets_bear
+    class_value = np.where(is_fixed, fixed > 0, sets_bull)
+    bull = _forward_fill(class_value, known_class)
+    prev_bull = np.roll(bull, 1)
+
+    tags[:] = np.select(
+        [
+            up & prev_bull,
+            up & ~prev_bull,
+            down & prev_bull,
+            down & ~prev_bull,
+            flat & prev_bull,
+            flat & ~prev_bull,
+        ],
+        [
+            np.where(prev_green_or_doji | above_prev_open, HIGHLY_BULLISH, BULLISH),
+            np.where(prev_green | above_prev_open, BULLISH, BEARISH),
+            np.where(prev_green_or_doji & above_prev_open, BULLISH, BEARISH),
+            np.where(prev_green & above_prev_open, BEARISH, HIGHLY_BEARISH),
+            np.where(prev_green_or_doji, 0, BULLISH),
+            np.where(prev_close < prev_open, BEARISH, 0),
+        ],
+        default=0,
+    )
+    tags[is_fixed] = fixed[is_fixed]
+
+    # Flat candles that keep the previous tag are left as 0 and filled in here
+    return _forward_fill(tags, tags != 0).astype(np.int8)
+
+
+def rolling_scores(tags: np.ndarray, starts: np.ndarray,
+                   windows: Sequence[int] = SCORE_WINDOWS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Array version of calculate_scores: for each window k the sum of the previous
+    k tag scores within the same series.
+
+    Returns (scores, valid), both shaped (len(windows), n); scores is int16 and
+    valid is False where the series does not yet have k earlier candles.
+    """
+    n = len(tags)
+    cumulative = np.concatenate(([0], np.cumsum(tags, dtype=np.int32)))
+    positions = _segment_positions(n, starts)
+    rows = np.arange(n)
+    scores = np.zeros((len(windows), n), dtype=np.int16)
+    valid = np.zeros((len(windows), n), dtype=bool)
+    for w, k in enumerate(windows):
+        ok = positions >= k
+        scores[w, ok] = cumulative[rows[ok]] - cumulative[rows[ok] - k]
+        valid[w] = ok
+    return scores, valid
+
+
+def score_series(ohlc: np.ndarray, starts: np.ndarray,
+                 fixed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Tag and score stacked ratio series; returns (tags, scores, valid)."""
+    ohlc = np.asarray(ohlc, dtype=np.float64).reshape(-1, 4)
+    tags = tag_codes(ohlc[:, OPEN], ohlc[:, CLOSE], starts, fixed)
+    scores, valid = rolling_scores(tags, starts)
+    return tags, scores, valid
@@ -0,0 +1,210 @@
+import argparse
+import psycopg2
+from datetime import date
+from typing import Optional
+
+from data_generation import bump_generation, create_generation_table
+
+# index_monthly_scores holds one row per (sectoral_index_id, month) with n1..n3 and b1..b3 side
+# by side; stock_monthly_scores one row per (stock_symbol, month) with the max and min of every
+# n1..b3 across the stock's sector indices, and the indices that had each score. In both,
+# n_rated/b_rated record that an n_ratios/b_ratios row exists, even one whose scores are all
+# NULL. The scorers (score2.py, score3.py) refresh both after writing n_ratios/b_ratios, so the
+# API reads them with index range scans instead of joining and aggregating the ratio tables.
+DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+
+SUBTYPES = ('n1', 'n2', 'n3', 'b1', 'b2', 'b3')
+RATED_COLUMNS = ('n_rated', 'b_rated')
+# The stock_index_mapping rows stock_monthly_scores was last built from
+MAPPING_TABLE = 'stock_monthly_scores_mapping'
+
+def add_rated_columns(cur, table: str) -> None:
+    # Tables built before n_rated/b_rated existed get them as NULL, which forces a full refresh
+    for column in RATED_COLUMNS:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} BOOLEAN")
+
+def create_index_monthly_scores_table(cur) -> None:
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS index_monthly_scores (
+            sectoral_index_id INT NOT NULL,
+            month DATE NOT NULL,
+            trade_date TIMESTAMPTZ NOT NULL,
+            {", ".join(f"{s} INT" for s in SUBTYPES)},
+            n_rated BOOLEAN,
+            b_rated BOOLEAN,
+            PRIMARY KEY (sectoral_index_id, month),
+            FOREIGN KEY (sectoral_index_id) REFERENCES indices(index_id) ON DELETE CASCADE
+        );
+    """)
+    add_rated_columns(cur, 'index_monthly_scores')
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_index_monthly_scores_sectoral_date
+        ON index_monthly_scores (sectoral_index_id, trade_date)
+    """)
+
+def create_stock_monthly_scores_table(cur) -> None:
+    score_columns = ",\n".join(f"{s}_max INT, {s}_min INT, {s}_index_ids INT[]" for s in SUBTYPES)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS stock_monthly_scores (
+            stock_symbol TEXT NOT NULL,
+            month DATE NOT NULL,
+            trade_date TIMESTAMPTZ NOT NULL,
+            {score_columns},
+            n_rated BOOLEAN,
+            b_rated BOOLEAN,
+            PRIMARY KEY (stock_symbol, month)
+        );
+    """)
+    add_rated_columns(cur, 'stock_monthly_scores')
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MAPPING_TABLE} (
+            stock_symbol TEXT NOT NULL,
+            index_id INT NOT NULL,
+            PRIMARY KEY (stock_symbol, index_id)
+        );
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_monthly_scores_date
+        ON stock_monthly_scores (trade_date, stock_symbol)
+    """)
+
+def unmaterialized_month(cur) -> Optional[date]:
+    """
+    Earliest month with an n_ratios/b_ratios row that index_monthly_scores does not hold, e.g.
+    the history the scorers write for a newly added index or benchmark pair.
+    """
+    cur.execute("""
+        SELECT MIN(month) FROM (
+            SELECT MIN(date_trunc('month', r.trade_date)::date) AS month
+            FROM n_ratios r
+            WHERE NOT EXISTS (
+                SELECT 1 FROM index_monthly_scores s
+                WHERE s.sectoral_index_id = r.sectoral_index_id
+                AND s.month = date_trunc('month', r.trade_date)::date
+                AND s.n_rated
+            )
+            UNION ALL
+            SELECT MIN(date_trunc('month', r.trade_date)::date)
+            FROM b_ratios r
+            WHERE NOT EXISTS (
+                SELECT 1 FROM index_monthly_scores s
+                WHERE s.sectoral_index_id = r.sectoral_index_id
+                AND s.month = date_trunc('month', r.trade_date)::date
+                AND s.b_rated
+            )
+        ) m
+    """)
+    return cur.fetchone()[0]
+
+def changed_mapping_stocks(cur) -> list:
+    """Stocks whose stock_index_mapping rows differ from those stock_monthly_scores was built from."""
+    cur.execute(f"""
+        SELECT DISTINCT stock_symbol FROM (
+            (SELECT stock_symbol, index_id FROM stock_index_mapping
+             EXCEPT SELECT stock_symbol, index_id FROM {MAPPING_TABLE})
+            UNION ALL
+            (SELECT stock_symbol, index_id FROM {MAPPING_TABLE}
+             EXCEPT SELECT stock_symbol, index_id FROM stock_index_mapping)
+        ) d
+    """)
+    return [row[0] for row in cur.fetchall()]
+
+def refresh_stock_monthly_scores(full: bool = False, from_month: Optional[date] = None, conn=None) -> int:
+    """
+    Rebuild index_monthly_scores and stock_monthly_scores from the earliest of: the latest month
+    already stored, `from_month` (the first month the caller wrote ratios for) and the first
+    month of any ratio row not yet materialized, such as a back-filled index's history. Every
+    month of a stock whose stock_index_mapping rows changed is rebuilt too; full rebuilds
+    everything. The data generations are bumped in the same transaction. trade_date is the
+    month's ratio bar date, so the handlers' trade_date range filters keep their meaning.
+    Returns the stock rows written.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = psycopg2.connect(DEFAULT_DB_URL)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                create_index_monthly_scores_table(cur)
+                create_stock_monthly_scores_table(cur)
+                cur.execute("SELECT EXISTS (SELECT 1 FROM index_monthly_scores WHERE n_rated IS NULL)")
+                if full or cur.fetchone()[0]:
+                    cur.execute(f"TRUNCATE index_monthly_scores, stock_monthly_scores, {MAPPING_TABLE}")
+                cur.execute("SELECT MAX(month) FROM index_monthly_scores")
+                starts = [cur.fetchone()[0] or date.min, unmaterialized_month(cur), from_month]
+                from_month = min(start for start in starts if start is not None).replace(day=1)
+                changed_stocks = changed_mapping_stocks(cur)
+                cur.execute("DELETE FROM index_monthly_scores WHERE month >= %s", (from_month,))
+                cur.execute("DELETE FROM stock_monthly_scores WHERE month >= %s OR stock_symbol = ANY(%s)",
+                            (from_month, changed_stocks))
+
+                # n and b scores of an (index, month) joined into one row; where a table has
+                # several rows for it, the latest trade_date (then benchmark) wins
+                month_rows = """
+                    SELECT DISTINCT ON (sectoral_index_id, month) *
+                    FROM (
+                        SELECT sectoral_index_id, date_trunc('month', trade_date)::date AS month,
+                               trade_date, benchmark_index_id, {columns}
+                        FROM {table}
+                        WHERE trade_date >= %s
+                    ) r
+                    ORDER BY sectoral_index_id, month, trade_date DESC, benchmark_index_id DESC
+                """
+                cur.execute(f"""
+                    INSERT INTO index_monthly_scores (sectoral_index_id, month, trade_date, {", ".join(SUBTYPES)},
+                                                      n_rated, b_rated)
+                    SELECT COALESCE(n.sectoral_index_id, b.sectoral_index_id),
+                           COALESCE(n.month, b.month),
+                           GREATEST(n.trade_date, b.trade_date),
+                           n.n1, n.n2, n.n3, b.b1, b.b2, b.b3,
+                           n.sectoral_index_id IS NOT NULL, b.sectoral_index_id IS NOT NULL
+                    FROM ({month_rows.format(columns="n1, n2, n3", table="n_ratios")}) n
+                    FULL JOIN ({month_rows.format(columns="b1, b2, b3", table="b_ratios")}) b
+                        ON b.sectoral_index_id = n.sectoral_index_id AND b.month = n.month
+                """, (from_month, from_month))
+                print(f"Refreshed {cur.rowcount} index_monthly_scores rows from {from_month}")
+
+                aggregates = ",\n".join(
+                    f"MAX(s.{c}), MIN(s.{c}), "
+                    f"array_agg(DISTINCT s.sectoral_index_id ORDER BY s.sectoral_index_id) FILTER (WHERE s.{c} IS NOT NULL)"
+                    for c in SUBTYPES
+                )
+                column_list = ", ".join(f"{c}_max, {c}_min, {c}_index_ids" for c in SUBTYPES)
+                cur.execute(f"""
+                    INSERT INTO stock_monthly_scores (stock_symbol, month, trade_date, {column_list},
+                                                      n_rated, b_rated)
+                    SELECT sim.stock_symbol, s.month, MAX(s.trade_date),
+                           {aggregates},
+                           bool_or(s.n_rated), bool_or(s.b_rated)
+                    FROM index_monthly_scores s
+                    JOIN stock_index_mapping sim ON sim.index_id = s.sectoral_index_id
+                    WHERE s.month >= %s OR sim.stock_symbol = ANY(%s)
+                    GROUP BY sim.stock_symbol, s.month
+                """, (from_month, changed_stocks))
+                rows = cur.rowcount
+                if changed_stocks:
+                    cur.execute(f"DELETE FROM {MAPPING_TABLE} WHERE stock_symbol = ANY(%s)", (changed_stocks,))
+                    cur.execute(f"""
+                        INSERT INTO {MAPPING_TABLE} (stock_symbol, index_id)
+                        SELECT DISTINCT stock_symbol, index_id FROM stock_index_mapping
+                        WHERE stock_symbol = ANY(%s)
+                    """, (changed_stocks,))
+                bump_generation(cur, 'index_monthly_scores', 'stock_monthly_scores')
+                print(f"Refreshed {rows} stock_monthly_scores rows from {from_month}"
+                      f" and all months of {len(changed_stocks)} remapped stocks")
+                return rows
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        return 0
+    finally:
+        if own_conn:
+            conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bring index_monthly_scores and stock_monthly_scores up to date with n_ratios/b_ratios.")
+    parser.add_argument('--full', action='store_true', help="rebuild every month instead of only new ones")
+    parser.add_argument('--from-month', type=date.fromisoformat,
+                        help="also rebuild every month from this date's month (YYYY-MM-DD)")
+    args = parser.parse_args()
+    create_generation_table()
+    refresh_stock_monthly_scores(full=args.full, from_month=args.from_month)
@@ -0,0 +1,106 @@
+import os
+from datetime import date
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from stock_monthly_scores import DEFAULT_DB_URL, refresh_stock_monthly_scores
+
+# Refreshes index_monthly_scores/stock_monthly_scores in a scratch schema after the writes the
+# scorers make: a new index back-filled with its whole history, and a remapped stock. The
+# refresh commits, so the schema is dropped at the end instead of rolled back.
+TEST_DB_URL = os.environ.get('TEST_DB_URL', DEFAULT_DB_URL)
+SCHEMA = 'test_stock_monthly_scores'
+
+def create_tables(cur):
+    cur.execute("CREATE TABLE indices (index_id INT PRIMARY KEY)")
+    cur.execute("INSERT INTO indices SELECT generate_series(1, 30)")
+    cur.execute("CREATE TABLE stock_index_mapping (stock_symbol TEXT NOT NULL, index_id INT NOT NULL)")
+    cur.execute("INSERT INTO stock_index_mapping VALUES ('STK1', 10), ('STK2', 20), ('STK3', 10)")
+    for table, columns in (('n_ratios', 'n1, n2, n3'), ('b_ratios', 'b1, b2, b3')):
+        cur.execute(f"""
+            CREATE TABLE {table} (
+                trade_date TIMESTAMPTZ NOT NULL,
+                sectoral_index_id INT NOT NULL,
+                benchmark_index_id INT NOT NULL,
+                {', '.join(f"{column} INT" for column in columns.split(', '))},
+                UNIQUE (trade_date, sectoral_index_id, benchmark_index_id)
+            )
+        """)
+    cur.execute("""
+        CREATE TABLE data_generation (
+            table_name TEXT PRIMARY KEY,
+            generation BIGINT NOT NULL,
+            committed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+def write_ratios(cur, index_id, start, end, score):
+    for table, columns in (('n_ratios', 'n1, n2, n3'), ('b_ratios', 'b1, b2, b3')):
+        cur.execute(f"""
+            INSERT INTO {table} (trade_date, sectoral_index_id, benchmark_index_id, {columns})
+            SELECT d, %s, 1, %s, %s, %s
+            FROM generate_series(%s::timestamptz, %s, interval '1 month') d
+        """, (index_id, score, score, score, start, end))
+
+def stock_months(cur, stock_symbol):
+    cur.execute("""
+        SELECT month, n1_max FROM stock_monthly_scores WHERE stock_symbol = %s ORDER BY month
+    """, (stock_symbol,))
+    return cur.fetchall()
+
+@pytest.fixture
+def conn():
+    try:
+        conn = psycopg2.connect(TEST_DB_URL)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {SCHEMA}")
+            cur.execute(f"SET search_path = {SCHEMA}")
+            create_tables(cur)
+            write_ratios(cur, 10, '2020-01-01', '2021-06-01', 5)
+        conn.commit()
+        refresh_stock_monthly_scores(conn=conn)
+        yield conn
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+@pytest.mark.parametrize('pass_from_month', [True, False], ids=['from_month', 'detected'])
+def test_backfilled_index_months_are_materialized(conn, pass_from_month):
+    with conn.cursor() as cur:
+        assert stock_months(cur, 'STK2') == []
+        write_ratios(cur, 20, '2020-01-01', '2021-06-01', 7)
+    conn.commit()
+
+    refresh_stock_monthly_scores(from_month=date(2020, 1, 1) if pass_from_month else None, conn=conn)
+
+    with conn.cursor() as cur:
+        months = stock_months(cur, 'STK2')
+        assert len(months) == 18
+        assert months[0] == (date(2020, 1, 1), 7)
+        cur.execute("SELECT COUNT(*) FROM index_monthly_scores WHERE sectoral_index_id = 20 AND n_rated AND b_rated")
+        assert cur.fetchone()[0] == 18
+
+def test_remapped_stock_gets_every_month(conn):
+    with conn.cursor() as cur:
+        write_ratios(cur, 20, '2020-01-01', '2021-06-01', 7)
+    conn.commit()
+    refresh_stock_monthly_scores(conn=conn)
+
+    with conn.cursor() as cur:
+        cur.execute("UPDATE stock_index_mapping SET index_id = 20 WHERE stock_symbol = 'STK3'")
+    conn.commit()
+    refresh_stock_monthly_scores(conn=conn)
+
+    with conn.cursor() as cur:
+        months = stock_months(cur, 'STK3')
+        assert len(months) == 18
+        assert {score for _, score in months} == {7}
+        assert {score for _, score in stock_months(cur, 'STK1')} == {5}
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from trade_date_indexes import (
+    DEFAULT_DB_URL, RANK_TABLES, RATIO_TABLES, index_statements, index_usage_queries, plan_index_names,
+)
+
+# EXPLAINs the month filters against ten years of synthetic rows in a scratch schema, with the
+# tables' existing unique (trade_date, ...) constraints in place, and checks each query names the
+# index trade_date_indexes creates for it. Everything runs in one transaction that is rolled
+# back, so TEST_DB_URL may point at any database the user can create a schema in.
+TEST_DB_URL = os.environ.get('TEST_DB_URL', DEFAULT_DB_URL)
+MONTHS = "generate_series('2012-01-01'::timestamptz, '2021-12-01', interval '1 month')"
+SECTORAL_INDICES = 100
+QUERIES = index_usage_queries()
+
+def create_tables(cur):
+    for table, columns in zip(RATIO_TABLES, ('n1, n2, n3', 'b1, b2, b3')):
+        cur.execute(f"""
+            CREATE TABLE {table} (
+                trade_date TIMESTAMPTZ NOT NULL,
+                sectoral_index_id INT NOT NULL,
+                benchmark_index_id INT NOT NULL,
+                {', '.join(f"{column} INT" for column in columns.split(', '))},
+                UNIQUE (trade_date, sectoral_index_id, benchmark_index_id)
+            )
+        """)
+        cur.execute(f"""
+            INSERT INTO {table} (trade_date, sectoral_index_id, benchmark_index_id, {columns})
+            SELECT d, s, b, 1, 2, 3
+            FROM {MONTHS} d, generate_series(1, {SECTORAL_INDICES}) s, generate_series(1, 2) b
+        """)
+    for table in RANK_TABLES:
+        depth = int(table.split('_')[1])
+        rank = ", rank INT NOT NULL" if depth > 1 else ""
+        cur.execute(f"""
+            CREATE TABLE {table} (
+                trade_date TIMESTAMPTZ NOT NULL,
+                ratio_type CHAR(1) NOT NULL,
+                sectoral_index_id INT NOT NULL,
+                score_type VARCHAR(2) NOT NULL,
+                score_value INT NOT NULL{rank},
+                UNIQUE (trade_date, ratio_type, score_type, sectoral_index_id)
+            )
+        """)
+        cur.execute(f"""
+            INSERT INTO {table} (trade_date, ratio_type, sectoral_index_id, score_type, score_value{', rank' if rank else ''})
+            SELECT d, upper(left(t, 1)), s, t, 5{', 1' if rank else ''}
+            FROM {MONTHS} d, generate_series(1, {SECTORAL_INDICES}) s,
+                 unnest(ARRAY['n1', 'n2', 'n3', 'b1', 'b2', 'b3']) t
+        """)
+
+@pytest.fixture(scope='module')
+def cur():
+    try:
+        conn = psycopg2.connect(TEST_DB_URL)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("CREATE SCHEMA test_trade_date_indexes")
+            cur.execute("SET LOCAL search_path = test_trade_date_indexes")
+            create_tables(cur)
+            for statement in index_statements():
+                cur.execute(statement)
+            for table in RATIO_TABLES + RANK_TABLES:
+                cur.execute(f"ANALYZE {table}")
+            yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+@pytest.mark.parametrize('index_name, sql, params', QUERIES, ids=[query[0] for query in QUERIES])
+def test_month_filter_uses_its_index(cur, index_name, sql, params):
+    assert index_name in plan_index_names(cur, sql, params)
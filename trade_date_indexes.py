@@ -0,0 +1,59 @@
+import psycopg2
+from typing import List, Set, Tuple
+
+from date_filters import month_predicate
+
+# Composite indexes behind the half-open trade_date filters built by date_filters, and the
+# representative queries test_trade_date_indexes.py EXPLAINs to check each one is used.
+DEFAULT_DB_URL = "dbname=ohcldata host=localhost port=5432 user=dhruvbhandari password=''"
+
+RATIO_TABLES = ('n_ratios', 'b_ratios')
+RANK_TABLES = tuple(f"{side}_{depth}_scores" for side in ('top', 'bottom') for depth in (1, 2, 3))
+
+def index_statements() -> List[str]:
+    statements = [f"CREATE INDEX IF NOT EXISTS idx_{table}_sectoral_date ON {table} (sectoral_index_id, trade_date)"
+                  for table in RATIO_TABLES + RANK_TABLES]
+    statements += [f"CREATE INDEX IF NOT EXISTS idx_{table}_date_score_type ON {table} (trade_date, score_type)"
+                   for table in RANK_TABLES]
+    return statements
+
+def migrate() -> None:
+    """Create the (sectoral_index_id, trade_date) and (trade_date, score_type) indexes if missing."""
+    try:
+        with psycopg2.connect(DEFAULT_DB_URL) as conn:
+            with conn.cursor() as cur:
+                for statement in index_statements():
+                    cur.execute(statement)
+                for table in RATIO_TABLES + RANK_TABLES:
+                    cur.execute(f"ANALYZE {table}")
+                conn.commit()
+                print(f"Ensured {len(index_statements())} indexes")
+    except psycopg2.Error as e:
+        print(f"Error creating indexes: {e}")
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+def plan_index_names(cur, sql: str, params) -> Set[str]:
+    """Names of the indexes the planner reads through for `sql`."""
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0][0]['Plan']
+    return {node['Index Name'] for node in plan_nodes(plan) if 'Index Name' in node}
+
+def index_usage_queries(year: int = 2021, month: int = 6, sectoral_id: int = 1) -> List[Tuple[str, str, list]]:
+    """(index the query should use, SQL, parameters) for representative month filters of each table."""
+    month_filter, month_params = month_predicate(year, month)
+    queries = [(f"idx_{table}_sectoral_date",
+                f"SELECT * FROM {table} WHERE sectoral_index_id = %s AND {month_filter}",
+                [sectoral_id, *month_params])
+               for table in RATIO_TABLES + RANK_TABLES]
+    queries += [(f"idx_{table}_date_score_type",
+                 f"SELECT * FROM {table} WHERE {month_filter} AND score_type = %s",
+                 [*month_params, 'n1'])
+                for table in RANK_TABLES]
+    return queries
+
+if __name__ == "__main__":
+    migrate()
@@ -2,6 +2,8 @@ import psycopg2
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
+from date_filters import month_predicate
+
 def get_db_connection():
     """Create and return a database connection."""
     return psycopg2.connect(
@@ -30,16 +32,16 @@ def get_score_for_index_subtype_date(index_id: int, sub_type: str, date: datetim
             else:
                 return None
 
+            month_filter, month_params = month_predicate(date.year, date.month)
             query = f"""
                 SELECT {column_name}
                 FROM {table_name}
                 WHERE sectoral_index_id = %s
-                AND EXTRACT(YEAR FROM trade_date) = %s
-                AND EXTRACT(MONTH FROM trade_date) = %s
+                AND {month_filter}
                 LIMIT 1
             """
             
-            cur.execute(query, (index_id, date.year, date.month))
+            cur.execute(query, (index_id, *month_params))
             result = cur.fetchone()
             return result[0] if result else None
             
@@ -56,30 +58,30 @@ def get_all_scores_for_index_date(index_id: int, date: datetime) -> Dict[str, Op
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
+            month_filter, month_params = month_predicate(date.year, date.month)
+
             # Query n_ratios
-            n_query = """
+            n_query = f"""
                 SELECT n1, n2, n3
                 FROM n_ratios
                 WHERE sectoral_index_id = %s
-                AND EXTRACT(YEAR FROM trade_date) = %s
-                AND EXTRACT(MONTH FROM trade_date) = %s
+                AND {month_filter}
                 LIMIT 1
             """
             
             # Query b_ratios
-            b_query = """
+            b_query = f"""
                 SELECT b1, b2, b3
                 FROM b_ratios
                 WHERE sectoral_index_id = %s
-                AND EXTRACT(YEAR FROM trade_date) = %s
-                AND EXTRACT(MONTH FROM trade_date) = %s
+                AND {month_filter}
                 LIMIT 1
             """
             
-            cur.execute(n_query, (index_id, date.year, date.month))
+            cur.execute(n_query, (index_id, *month_params))
             n_result = cur.fetchone()
             
-            cur.execute(b_query, (index_id, date.year, date.month))
+            cur.execute(b_query, (index_id, *month_params))
             b_result = cur.fetchone()
             
             scores = {}
@@ -121,6 +123,7 @@ def get_scores_for_subtype_date(sub_type: str, date: datetime) -> List[Tuple[int
             else:
                 return []
 
+            month_filter, month_params = month_predicate(date.year, date.month, 'r.trade_date')
             query = f"""
                 SELECT 
                     r.sectoral_index_id,
@@ -128,11 +131,10 @@ def get_scores_for_subtype_date(sub_type: str, date: datetime) -> List[Tuple[int
                     r.{column_name}
                 FROM {table_name} r
                 JOIN indices i ON r.sectoral_index_id = i.index_id
-                WHERE EXTRACT(YEAR FROM r.trade_date) = %s
-                AND EXTRACT(MONTH FROM r.trade_date) = %s
+                WHERE {month_filter}
             """
             
-            cur.execute(query, (date.year, date.month))
+            cur.execute(query, month_params)
             return cur.fetchall()
             
     except Exception as e:
@@ -148,16 +150,16 @@ def get_monthly_ohlc_for_index(index_id: int, date: datetime) -> Dict[str, float
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            query = """
+            month_filter, month_params = month_predicate(date.year, date.month)
+            query = f"""
                 SELECT open_price, high_price, low_price, close_price
                 FROM monthly_ohlc
                 WHERE index_id = %s
-                AND EXTRACT(YEAR FROM trade_date) = %s
-                AND EXTRACT(MONTH FROM trade_date) = %s
+                AND {month_filter}
                 LIMIT 1
             """
             
-            cur.execute(query, (index_id, date.year, date.month))
+            cur.execute(query, (index_id, *month_params))
             result = cur.fetchone()
             if result:
                 return {